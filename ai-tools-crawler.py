@@ -1,43 +1,1564 @@
+import argparse
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, FeatureNotFound
 import json
 from datetime import datetime
 import logging
 import re
 import time
-from urllib.parse import urlparse, urljoin, urlunparse
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlparse, urljoin, urlunparse
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (InvalidSessionIdException, NoSuchElementException, NoSuchWindowException,
+                                        TimeoutException, WebDriverException)
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
 import random
 from PIL import Image
+from requests.adapters import HTTPAdapter
+import gzip
+import hashlib
+import heapq
 import io
+import itertools
 import os
+import queue
+import socket
+import sqlite3
+import textwrap
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# 需要跟随跳转才能得到真实地址的短链/跳转域名
+REDIRECT_HOSTS = {'bit.ly', 'tinyurl.com', 't.co', 'ow.ly', 'buff.ly', 'rebrand.ly', 'goo.gl', 'is.gd'}
+
+# 清理网站URL时去掉的跟踪参数，其余查询参数保留
+TRACKING_QUERY_PARAMS = {'ref', 'ref_src', 'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid',
+                         'mc_cid', 'mc_eid', 'igshid', '_ga', '_gl'}
+TRACKING_QUERY_PREFIXES = ('utm_', 'pk_', 'mtm_')
+
+# 错误类型：超时和疑似反爬按指数退避重试，浏览器崩溃重启后立即重试，其余不重试
+TRANSIENT_ERRORS = {'timeout', 'bot_block'}
+DRIVER_CRASH_MARKERS = ('chrome not reachable', 'tab crashed', 'session deleted', 'disconnected',
+                        'no such window', 'invalid session id', 'target window already closed')
+BOT_BLOCK_PATTERN = re.compile(r'just a moment|attention required|access denied|are you a robot|captcha|'
+                               r'too many requests', re.I)
+BOT_BLOCK_STATUS = {403, 429, 503}
+
+# 读取 canonical 时最多下载的正文字节数，<head> 通常都在这个范围内
+CANONICAL_READ_LIMIT = 128 * 1024
+
+# 增量模式下用于判断卡片是否变化的列表页字段
+INCREMENTAL_FIELDS = ('description', 'thumbnail', 'followers', 'tags')
+
+PRODUCT_CARD_SELECTOR = '[data-sentry-component="ProductItem"]'
+
+# 采集页面就绪信号：PerformanceObserver 统计完成的请求数近似网络活动（资源计时缓冲区默认只有
+# 250 条，写满后 getEntriesByType 的数量不再变化），MutationObserver 统计DOM变更，
+# 只统计视口内尚未加载结束的图片（懒加载和被拦截的图片不会阻塞）
+READINESS_SCRIPT = """
+if (!window.__crawlerMutations) {
+    window.__crawlerMutations = {count: 0};
+    new MutationObserver(function (records) {
+        window.__crawlerMutations.count += records.length;
+    }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    if (performance.setResourceTimingBufferSize) {
+        performance.setResourceTimingBufferSize(100000);
+    }
+    if (window.PerformanceObserver) {
+        window.__crawlerResources = {count: 0};
+        new PerformanceObserver(function (list) {
+            window.__crawlerResources.count += list.getEntries().length;
+        }).observe({type: 'resource', buffered: true});
+    }
+}
+var pendingImages = Array.prototype.filter.call(document.images, function (img) {
+    var rect = img.getBoundingClientRect();
+    var visible = rect.bottom > 0 && rect.top < window.innerHeight;
+    return visible && !img.complete;
+}).length;
+return {
+    ready: document.readyState,
+    resources: window.__crawlerResources ? window.__crawlerResources.count
+        : performance.getEntriesByType('resource').length,
+    mutations: window.__crawlerMutations.count,
+    cards: arguments[0] ? document.querySelectorAll(arguments[0]).length : 0,
+    height: document.body ? document.body.scrollHeight : 0,
+    pendingImages: pendingImages
+};
+"""
+
+# 在浏览器中批量提取卡片字段，只返回本页面尚未返回过的卡片
+CARD_EXTRACT_SCRIPT = """
+var seen = window.__crawlerSeenCards || (window.__crawlerSeenCards = {});
+var release = arguments[1];
+var cards = [];
+document.querySelectorAll(arguments[0]).forEach(function (card) {
+    var link = card.querySelector('a[href]');
+    var href = link ? link.getAttribute('href') : null;
+    if (!href || seen[href]) {
+        return;
+    }
+    seen[href] = true;
+    var nameElem = card.querySelector('div[data-test="product-item-name"]');
+    var thumbnail = card.querySelector('img[loading="lazy"]');
+    var followers = card.querySelector('div.styles_followersCount__Auv5S');
+    cards.push({
+        nameText: nameElem ? nameElem.textContent : null,
+        href: href,
+        thumbnail: thumbnail ? thumbnail.getAttribute('src') : '',
+        tags: Array.prototype.map.call(card.querySelectorAll('a.text-12'), function (a) {
+            return a.textContent.trim();
+        }).filter(Boolean),
+        followersText: followers ? followers.textContent : '0'
+    });
+    if (release) {
+        // 有界内存模式：保留卡片高度以免影响滚动位置，清空已提取卡片的子树释放内存
+        card.style.height = card.offsetHeight + 'px';
+        card.replaceChildren();
+    }
+});
+return cards;
+"""
+
+# 详情页 Visit website 链接的候选选择器
+WEBSITE_LINK_SELECTORS = [
+    "//a[contains(text(), 'Visit website')]",
+    "//a[contains(@class, 'styles_websiteButton')]",
+    "//a[contains(@data-test, 'website-link')]",
+    "//a[contains(@class, 'styles_button') and contains(@class, 'styles_website')]"
+]
+
+# 列表页 Top Products 标签的候选选择器
+TOP_PRODUCTS_SELECTORS = [
+    "//button[contains(text(), 'Top Products')]",
+    "//button[contains(@class, 'styles_inactiveTab') and contains(text(), 'Top Products')]",
+    "//div[contains(@class, 'flex-row')]//button[contains(text(), 'Top Products')]"
+]
+
+# 按顺序计算所有候选XPath，返回第一个匹配的元素及其序号
+SELECTOR_FIND_SCRIPT = """
+var candidates = arguments[0];
+var clickable = arguments[1];
+for (var i = 0; i < candidates.length; i++) {
+    var node = document.evaluate(candidates[i], document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (node && (!clickable || (node.offsetParent !== null && !node.disabled))) {
+        return [node, i];
+    }
+}
+return null;
+"""
+
+TRACKER_URL_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*facebook.net*',
+    '*segment.io*', '*segment.com*', '*hotjar.com*', '*sentry.io*', '*intercom.io*',
+    '*clarity.ms*', '*amplitude.com*', '*mixpanel.com*', '*hubspot.com*'
+]
+
+MEDIA_URL_PATTERNS = [
+    '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*',
+    '*.mp4*', '*.webm*', '*.m3u8*', '*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*imgix.net*'
+]
+
+# 各类导航使用的资源拦截策略（Network.setBlockedURLs 通配符）
+RESOURCE_PROFILES = {
+    # 列表页：卡片数据在HTML里，图片只需要 src 属性
+    'listing': MEDIA_URL_PATTERNS + TRACKER_URL_PATTERNS,
+    # 详情页：只需要 Visit website 链接的 href
+    'detail-link-only': MEDIA_URL_PATTERNS + TRACKER_URL_PATTERNS + [
+        '*.css*', '*youtube.com*', '*vimeo.com*', '*loom.com*'
+    ],
+    # 截图：保持页面原样
+    'screenshot': []
+}
+
+
+def normalize_product_url(url):
+    """规范化产品URL作为缓存键：小写域名，去掉查询参数、锚点、末尾斜杠和 /shoutouts"""
+    parsed = urlparse(url.strip())
+    path = parsed.path.split('/shoutouts')[0].rstrip('/')
+    return urlunparse((parsed.scheme.lower() or 'https', parsed.netloc.lower(), path, '', '', ''))
+
+
+class CrawlError(Exception):
+    """已知类型的爬取错误，kind 与 classify_error 的返回值一致"""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+def classify_error(error):
+    """
+    将异常归类，决定是否重试
+
+    Returns:
+        str: timeout、bot_block、missing_selector、driver_crash 或 other
+    """
+    if isinstance(error, CrawlError):
+        return error.kind
+    if isinstance(error, (TimeoutException, requests.Timeout)):
+        return 'timeout'
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException)):
+        return 'driver_crash'
+    if isinstance(error, NoSuchElementException):
+        return 'missing_selector'
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return 'bot_block' if error.response.status_code in BOT_BLOCK_STATUS else 'other'
+    if isinstance(error, requests.ConnectionError):
+        # 到目标站点的网络错误与超时同样是暂时性的
+        return 'timeout'
+    if isinstance(error, (ConnectionError, Urllib3HTTPError)):
+        # 本机与 chromedriver 之间的连接断开
+        return 'driver_crash'
+    message = str(error).lower()
+    if isinstance(error, WebDriverException):
+        if any(marker in message for marker in DRIVER_CRASH_MARKERS):
+            return 'driver_crash'
+        if 'timeout' in message or 'timed out' in message:
+            return 'timeout'
+    return 'other'
+
+
+def is_redirect_link(url):
+    """是否为短链或ProductHunt跳转链接"""
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    return host in REDIRECT_HOSTS or (host.endswith('producthunt.com') and parsed.path.startswith('/r/'))
+
+
+def clean_website_url(url):
+    """去掉锚点和跟踪参数（utm_*、ref 等），其余查询参数原样保留，域名小写"""
+    parsed = urlparse(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_QUERY_PARAMS and not k.lower().startswith(TRACKING_QUERY_PREFIXES)]
+    return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), parsed.path, '', urlencode(query), ''))
+
+
+def website_site_key(url):
+    """规范网站地址的去重键：忽略协议、www 前缀和末尾斜杠"""
+    parsed = urlparse(clean_website_url(url))
+    key = parsed.netloc.removeprefix('www.') + parsed.path.rstrip('/')
+    return f"{key}?{parsed.query}" if parsed.query else key
+
+
+def extract_canonical_url(html, base_url):
+    """从页面头部读取 <link rel=canonical> 或 og:url，只接受与当前页面同一站点的地址"""
+    soup = BeautifulSoup(html, 'html.parser')
+    candidates = []
+    link = soup.find('link', rel='canonical', href=True)
+    if link:
+        candidates.append(link['href'])
+    meta = soup.find('meta', property='og:url', content=True)
+    if meta:
+        candidates.append(meta['content'])
+
+    base_host = urlparse(base_url).netloc.lower().removeprefix('www.')
+    for candidate in candidates:
+        url = urljoin(base_url, candidate.strip())
+        parsed = urlparse(url)
+        if parsed.scheme in ('http', 'https') and parsed.netloc.lower().removeprefix('www.') == base_host:
+            return url
+    return None
+
+
+# 常驻模式下任务允许覆盖的配置项，路径类配置只能在启动常驻进程时指定
+DAEMON_JOB_CONFIG_KEYS = ('workers', 'screenshot_workers', 'incremental', 'resume',
+                          'bounded_memory', 'export_formats')
+
+
+def parse_address(value):
+    """把 [HOST:]PORT 解析为 multiprocessing 连接地址，未指定主机时只监听本机"""
+    host, _, port = value.rpartition(':')
+    return (host or 'localhost', int(port))
+
+
+def submit_job(address, authkey, job):
+    """向常驻爬虫提交一个任务，阻塞到任务完成并返回结果摘要"""
+    with Client(address, authkey=authkey) as conn:
+        conn.send(job)
+        return conn.recv()
+
+
+class CrawlCache:
+    """基于SQLite的持久化缓存，保存产品真实URL和截图，按字段设置过期时间并按LRU淘汰"""
+
+    FIELD_GROUPS = {
+        'url': ('real_url', 'clean_url'),
+        'screenshot': ('screenshot', 'content_hash', 'phash')
+    }
+    # 产品真实URL按ProductHunt详情页缓存；截图按规范网站缓存，保留区分页面的查询参数
+    KEY_FUNCTIONS = {
+        'url': normalize_product_url,
+        'screenshot': website_site_key
+    }
+
+    def __init__(self, path, ttls, max_entries):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS products (
+                    key TEXT PRIMARY KEY,
+                    real_url TEXT,
+                    clean_url TEXT,
+                    url_at REAL,
+                    screenshot TEXT,
+                    content_hash TEXT,
+                    phash TEXT,
+                    screenshot_at REAL,
+                    last_access REAL
+                )
+            """)
+            # 旧版本创建的缓存文件没有感知哈希列
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(products)")}
+            if 'phash' not in columns:
+                self.conn.execute("ALTER TABLE products ADD COLUMN phash TEXT")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_products_access ON products(last_access)")
+
+    def get(self, url, group, include_expired=False):
+        """
+        读取一组缓存字段
+
+        Args:
+            url: 'url' 组为产品详情页URL，'screenshot' 组为规范网站地址
+            group: 'url' 或 'screenshot'
+            include_expired: 为True时忽略有效期（如与上一次截图比较变化）
+
+        Returns:
+            dict: 字段值，未命中或已过期返回None
+        """
+        key = self.KEY_FUNCTIONS[group](url)
+        columns = self.FIELD_GROUPS[group]
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                f"SELECT {', '.join(columns)}, {group}_at FROM products WHERE key = ?", (key,)
+            ).fetchone()
+            if not row or row[-1] is None or (not include_expired and now - row[-1] > self.ttls[group]):
+                return None
+            self.conn.execute("UPDATE products SET last_access = ? WHERE key = ?", (now, key))
+        return dict(zip(columns, row[:-1]))
+
+    def put(self, url, group, **values):
+        """写入一组缓存字段并刷新该组的时间戳"""
+        key = self.KEY_FUNCTIONS[group](url)
+        columns = [c for c in self.FIELD_GROUPS[group] if c in values]
+        now = time.time()
+        assignments = ', '.join(f"{c} = excluded.{c}" for c in columns)
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"""INSERT INTO products (key, {', '.join(columns)}, {group}_at, last_access)
+                    VALUES (?, {', '.join('?' for _ in columns)}, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET {assignments},
+                        {group}_at = excluded.{group}_at, last_access = excluded.last_access""",
+                (key, *[values[c] for c in columns], now, now)
+            )
+            self.evict()
+
+    def evict(self):
+        """超过容量时按最近访问时间淘汰最旧的条目（调用方需持有锁）"""
+        count = self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM products WHERE key IN "
+                "(SELECT key FROM products ORDER BY last_access ASC LIMIT ?)", (overflow,)
+            )
+            logging.info(f"缓存已满，淘汰 {overflow} 条记录")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def encode_screenshot(png, directory, base_name, formats, quality, thumbnail_sizes):
+    """
+    将PNG截图编码为配置的格式并生成缩略图（在进程池中运行）
+
+    Returns:
+        list: 写入的文件名，第一个为主格式截图
+    """
+    filenames = []
+    with Image.open(io.BytesIO(png)) as img:
+        img.load()
+        variants = [(base_name, img)]
+        for width, height in thumbnail_sizes:
+            thumb = img.copy()
+            thumb.thumbnail((width, height))
+            variants.append((f"{base_name}_{width}x{height}", thumb))
+
+        for name, image in variants:
+            for fmt in formats:
+                fmt = fmt.lower()
+                filename = f"{name}.{'jpg' if fmt == 'jpeg' else fmt}"
+                path = os.path.join(directory, filename)
+                # 先写临时文件再替换，按内容命名的文件存在即代表完整
+                tmp_path = f"{path}.tmp"
+                if fmt == 'png':
+                    image.save(tmp_path, 'PNG', optimize=True)
+                elif fmt == 'webp':
+                    image.save(tmp_path, 'WEBP', quality=quality, method=4)
+                elif fmt == 'jpeg':
+                    image.convert('RGB').save(tmp_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+                else:
+                    raise ValueError(f"不支持的截图格式: {fmt}")
+                os.replace(tmp_path, path)
+                filenames.append(filename)
+    return filenames
+
+
+def perceptual_hash(png, size=8):
+    """
+    计算截图的差值哈希（dHash），在进程池中运行
+
+    缩成 (size+1)×size 的灰度图后比较每行相邻像素，得到 size×size 位的指纹，
+    轻微的渲染差异（抗锯齿、压缩噪点）不会改变指纹。
+
+    Returns:
+        str: 十六进制指纹
+    """
+    with Image.open(io.BytesIO(png)) as img:
+        small = img.convert('L').resize((size + 1, size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hash_distance(a, b):
+    """两个十六进制指纹之间不同的位数占比，0 表示视觉上相同"""
+    return bin(int(a, 16) ^ int(b, 16)).count('1') / (len(a) * 4)
+
+
+class BrowserSession:
+    """一个长期存活的浏览器实例及其标签页状态"""
+
+    def __init__(self, driver, separate_work_tab):
+        self.driver = driver
+        self.separate_work_tab = separate_work_tab
+        self.main_handle = driver.current_window_handle
+        # 不需要保留列表页的实例直接在主标签页里工作，完全不用切换
+        self.work_handle = None if separate_work_tab else self.main_handle
+        self.current_handle = self.main_handle
+        self.tab_uses = 0
+        self.warmed = False  # 是否已经访问过站点首页
+        self.generation = 0  # 重启次数，持有会话的调用方据此判断页面状态是否已丢失
+
+
+class BrowserManager:
+    """
+    浏览器管理器：按用途分组保留浏览器实例，跨产品和跨任务（常驻模式）复用
+
+    需要保留列表页的实例另开一个预先设置好尺寸的工作标签页，详情页和截图都在其中导航，
+    工作标签页使用一定次数后关闭重开；浏览器只在崩溃或内存超过阈值时重启。
+    """
+
+    def __init__(self, factory, tab_max_uses=50, memory_limit_mb=None):
+        self.factory = factory
+        self.tab_max_uses = tab_max_uses
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.groups = {}
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.stats = {'drivers_started': 0, 'driver_restarts': 0, 'tabs_recycled': 0}
+
+    def start_session(self, separate_work_tab):
+        session = BrowserSession(self.factory(), separate_work_tab)
+        with self.lock:
+            self.sessions[id(session.driver)] = session
+            self.stats['drivers_started'] += 1
+        return session
+
+    def group(self, name, count, separate_work_tab=False):
+        """返回该用途的前 count 个实例，不足时启动新浏览器，已有实例直接复用"""
+        sessions = self.groups.setdefault(name, [])
+        while len(sessions) < count:
+            sessions.append(self.start_session(separate_work_tab))
+        return sessions[:count]
+
+    def session_for(self, driver):
+        with self.lock:
+            return self.sessions.get(id(driver))
+
+    def switch(self, session, handle):
+        if session.current_handle != handle:
+            session.driver.switch_to.window(handle)
+            session.current_handle = handle
+
+    def open_work_tab(self, session):
+        session.driver.switch_to.new_window('tab')
+        session.driver.set_window_size(1920, 1080)
+        session.work_handle = session.driver.current_window_handle
+        session.current_handle = session.work_handle
+        session.tab_uses = 0
+
+    @contextmanager
+    def work_tab(self, driver):
+        """切到实例的工作标签页（已在其中时不产生任何往返），结束后不切回"""
+        session = self.session_for(driver)
+        if session is None:
+            yield driver
+            return
+        if session.work_handle is None:
+            self.open_work_tab(session)
+        else:
+            self.switch(session, session.work_handle)
+        try:
+            yield driver
+        finally:
+            session.tab_uses += 1
+            if session.separate_work_tab and self.tab_max_uses and session.tab_uses >= self.tab_max_uses:
+                self.recycle_work_tab(session)
+
+    def recycle_work_tab(self, session):
+        """关闭用满次数的工作标签页，下次使用时重新打开，释放标签页积累的内存"""
+        try:
+            self.switch(session, session.work_handle)
+            session.driver.close()
+            session.driver.switch_to.window(session.main_handle)
+            session.current_handle = session.main_handle
+            session.work_handle = None
+            with self.lock:
+                self.stats['tabs_recycled'] += 1
+        except Exception as e:
+            logging.warning(f"回收工作标签页失败，重启浏览器: {str(e)}")
+            self.restart(session)
+
+    def main_tab(self, driver):
+        """切回实例的主标签页"""
+        session = self.session_for(driver)
+        if session:
+            self.switch(session, session.main_handle)
+
+    def check(self, session):
+        """
+        检查浏览器是否仍然可用，崩溃或JS堆超过内存阈值时重启
+
+        Returns:
+            bool: 是否发生了重启
+        """
+        try:
+            used = session.driver.execute_script(
+                "return performance.memory ? performance.memory.usedJSHeapSize : 0;")
+        except Exception as e:
+            logging.error(f"浏览器已不可用，重启: {str(e)}")
+            self.restart(session)
+            return True
+        if self.memory_limit and used and used > self.memory_limit:
+            logging.warning(f"浏览器JS堆占用 {used / 1024 / 1024:.0f} MB 超过阈值，重启")
+            self.restart(session)
+            return True
+        return False
+
+    def restart(self, session):
+        """在原会话对象上换一个新的浏览器进程，持有该会话的调用方无需感知"""
+        with self.lock:
+            self.sessions.pop(id(session.driver), None)
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+        fresh = BrowserSession(self.factory(), session.separate_work_tab)
+        fresh.generation = session.generation + 1
+        session.__dict__.update(fresh.__dict__)
+        with self.lock:
+            self.sessions[id(session.driver)] = session
+            self.stats['driver_restarts'] += 1
+
+    def close(self):
+        """关闭所有浏览器"""
+        for sessions in self.groups.values():
+            for session in sessions:
+                try:
+                    session.driver.quit()
+                except Exception:
+                    pass
+        self.groups = {}
+        with self.lock:
+            self.sessions = {}
+
+
+class ScreenshotPipeline:
+    """独立的截图流水线：使用自己的浏览器池截图，压缩在进程池中完成，爬取循环只负责提交URL"""
+
+    def __init__(self, crawler, workers):
+        self.crawler = crawler
+        self.drivers = queue.Queue()
+        # 浏览器由管理器持有，流水线关闭后仍保持预热供下一个任务使用
+        for session in crawler.browser.group('screenshot', workers):
+            self.drivers.put(session)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='screenshot')
+        logging.info(f"截图流水线已启动，浏览器实例 {workers} 个")
+
+    def submit(self, url, tool_name, cache_key=None):
+        """提交截图任务，返回结果为截图文件名的 Future"""
+        return self.executor.submit(self.run_job, url, tool_name, cache_key)
+
+    def run_job(self, url, tool_name, cache_key):
+        cached = self.crawler.get_cached_screenshot(cache_key)
+        if cached:
+            return cached
+
+        session = self.drivers.get()
+        try:
+            png = self.crawler.capture_website_screenshot(url, driver=session.driver)
+            self.crawler.browser.check(session)
+        finally:
+            # 压缩前先归还浏览器，下一张截图可以立即开始
+            self.drivers.put(session)
+        return self.crawler.store_screenshot(png, tool_name, cache_key)
+
+    def close(self):
+        """等待所有截图任务完成"""
+        self.executor.shutdown(wait=True)
+
+
+class TokenBucket:
+    """令牌桶限速器：平均每秒 rate 次，允许 burst 次突发"""
+
+    def __init__(self, rate, burst=1, jitter=0):
+        self.rate = rate
+        self.capacity = burst
+        self.jitter = jitter
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，不足时阻塞等待；先扣减再等待，保证并发线程按到达顺序排队"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if self.jitter:
+            wait += random.uniform(0, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class SharedTokenBucket:
+    """保存在任务队列数据库中的令牌桶，分布式模式下多个进程共用同一个限速"""
+
+    def __init__(self, job_queue, key, rate, burst=1, jitter=0):
+        self.job_queue = job_queue
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+
+    def acquire(self):
+        wait = self.job_queue.reserve_slot(self.key, 1 / self.rate, self.burst)
+        if self.jitter:
+            wait += random.uniform(0, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """
+    按域名分配令牌桶，子域名共用父域名的限速配置，未配置的域名不限速
+
+    给定 job_queue 时令牌桶保存在任务队列数据库中，所有工作进程共享同一个限速。
+    """
+
+    def __init__(self, limits, default=None, job_queue=None):
+        self.limits = limits
+        self.default = default
+        self.job_queue = job_queue
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, host):
+        host = host.lower().split(':')[0]
+        domain = next((d for d in self.limits if host == d or host.endswith('.' + d)), None)
+        limit = self.limits[domain] if domain else self.default
+        if not limit:
+            return None
+        key = domain or host
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = (SharedTokenBucket(self.job_queue, key, **limit) if self.job_queue
+                                     else TokenBucket(**limit))
+            return self.buckets[key]
+
+    def wait(self, url):
+        bucket = self.bucket_for(urlparse(url).netloc)
+        return bucket.acquire() if bucket else 0
+
+
+class CircuitBreaker:
+    """
+    按域名的熔断器：连续失败达到阈值后熔断，冷却期内直接跳过该域名，
+    冷却期结束后只放行一个线程的试探请求，其余调用方在试探结果出来前继续被拒绝，
+    成功则恢复，失败则重新熔断
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=300):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.opened_at = {}
+        self.probes = {}  # 域名 -> 正在试探的线程
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc.lower().removeprefix('www.')
+
+    def allow(self, url):
+        """该域名当前是否允许请求；持有试探名额的线程重试时仍然放行"""
+        host = self.host_of(url)
+        with self.lock:
+            opened = self.opened_at.get(host)
+            if opened is None or self.probes.get(host) == threading.get_ident():
+                return True
+            if host not in self.probes and time.time() - opened >= self.cooldown:
+                # 半开状态：放行一次试探，失败会立即重新熔断
+                self.probes[host] = threading.get_ident()
+                return True
+            return False
+
+    def is_open(self, url):
+        """该域名是否处于熔断或试探中（不放行新的试探）"""
+        with self.lock:
+            return self.host_of(url) in self.opened_at
+
+    def release(self, url):
+        """试探请求既未成功也未记为失败（如错误不计入熔断）时交还试探名额，由下一个调用方重新试探"""
+        host = self.host_of(url)
+        with self.lock:
+            if self.probes.get(host) == threading.get_ident():
+                self.probes.pop(host)
+
+    def record_success(self, url):
+        host = self.host_of(url)
+        with self.lock:
+            self.failures.pop(host, None)
+            self.opened_at.pop(host, None)
+            self.probes.pop(host, None)
+
+    def record_failure(self, url):
+        """
+        记录一次失败
+
+        Returns:
+            bool: 本次失败是否触发熔断
+        """
+        host = self.host_of(url)
+        with self.lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+            if self.probes.pop(host, None) is not None:
+                # 试探失败，重新开始冷却
+                self.opened_at[host] = time.time()
+                return True
+            if self.failures[host] >= self.failure_threshold and host not in self.opened_at:
+                self.opened_at[host] = time.time()
+                return True
+            return False
+
+
+class CrawlScheduler:
+    """多话题、多来源的产品调度队列：按产品URL去重，按关注者数量优先处理"""
+
+    def __init__(self, by_followers=True):
+        self.by_followers = by_followers
+        self.cards = []
+        self.heap = []
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def push(self, card_info):
+        """
+        加入一个产品卡片
+
+        Returns:
+            bool: 是新产品返回True；已在其他话题下出现过时只合并话题并返回False
+        """
+        key = normalize_product_url(card_info['product_url'])
+        with self.lock:
+            if key in self.seen:
+                existing = self.seen[key]
+                topics = list(existing.get('topics', []))
+                for topic in card_info.get('topics', []):
+                    if topic not in topics:
+                        topics.append(topic)
+                existing['topics'] = topics
+                return False
+            index = len(self.cards)
+            self.cards.append(card_info)
+            self.seen[key] = card_info
+            priority = -card_info.get('followers', 0) if self.by_followers else index
+            heapq.heappush(self.heap, (priority, index))
+            return True
+
+    def pop(self):
+        """取出优先级最高的产品，队列为空时返回None"""
+        with self.lock:
+            if not self.heap:
+                return None
+            _, index = heapq.heappop(self.heap)
+            return index, self.cards[index]
+
+    def __len__(self):
+        return len(self.cards)
+
+
+class JobQueue:
+    """
+    基于SQLite的持久化任务队列，协调进程写入产品任务，多个工作进程按租约领取
+
+    领取时写入租约到期时间，工作进程崩溃后租约过期的任务会被放回队列；
+    同一任务被领取超过 max_attempts 次仍未完成则标记为失败，避免反复拖垮工作进程。
+    """
+
+    def __init__(self, path, lease_seconds=600, max_attempts=3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        # 自动提交模式，写操作显式使用 BEGIN IMMEDIATE 在进程间串行化
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT UNIQUE,
+                    position INTEGER,
+                    priority INTEGER,
+                    payload TEXT,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    updated_at REAL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, priority)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            # 共享令牌桶：每个限速键下一个请求的理论到达时间
+            self.conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, next_allowed REAL)")
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def set_meta(self, name, value):
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO meta (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = excluded.value", (name, value))
+
+    def get_meta(self, name):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def reserve_slot(self, key, interval, burst=1):
+        """
+        在共享令牌桶中预约一次请求（GCRA），在事务中完成，所有进程按预约顺序排队
+
+        Returns:
+            float: 调用方需要等待的秒数
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT next_allowed FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            arrival = max(row[0] if row else now, now)
+            conn.execute("INSERT INTO rate_limits (key, next_allowed) VALUES (?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET next_allowed = excluded.next_allowed",
+                         (key, arrival + interval))
+        return max(0.0, arrival - (burst - 1) * interval - now)
+
+    def start_run(self, run_id):
+        """清空上一次运行并登记新一轮的运行ID，状态置为列表页阶段"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM jobs")
+            conn.execute("DELETE FROM meta")
+            conn.executemany("INSERT INTO meta (name, value) VALUES (?, ?)",
+                             [('run_id', run_id), ('run_state', 'listing')])
+
+    def run_state(self):
+        """
+        当前运行的状态
+
+        Returns:
+            tuple: (运行ID, 状态)，状态为 listing/queued/finished，队列从未使用过时为 (None, None)
+        """
+        with self.lock:
+            rows = dict(self.conn.execute(
+                "SELECT name, value FROM meta WHERE name IN ('run_id', 'run_state')").fetchall())
+        return rows.get('run_id'), rows.get('run_state')
+
+    def enqueue(self, jobs):
+        """
+        批量写入任务
+
+        Args:
+            jobs: (列表序号, 优先级, 卡片信息) 的列表，优先级数值小的先处理
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO jobs (key, position, priority, payload, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO NOTHING",
+                [(normalize_product_url(card_info['product_url']), position, priority,
+                  json.dumps(card_info, ensure_ascii=False), now)
+                 for position, priority, card_info in jobs]
+            )
+
+    def reclaim_expired(self, conn):
+        """把租约过期的任务放回队列，领取次数用尽的标记为失败（调用方需在事务中）"""
+        now = time.time()
+        conn.execute("UPDATE jobs SET status = 'failed', lease_owner = NULL, updated_at = ? "
+                      "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                      (now, now, self.max_attempts))
+        reclaimed = conn.execute("UPDATE jobs SET status = 'pending', lease_owner = NULL, updated_at = ? "
+                                 "WHERE status = 'leased' AND lease_expires < ?", (now, now)).rowcount
+        if reclaimed:
+            logging.warning(f"回收 {reclaimed} 个租约过期的任务")
+
+    def claim(self, worker_id):
+        """
+        领取优先级最高的待处理任务
+
+        Returns:
+            tuple: (任务ID, 卡片信息)，没有可领取的任务时返回None
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            self.reclaim_expired(conn)
+            row = conn.execute("SELECT id, payload FROM jobs WHERE status = 'pending' "
+                               "ORDER BY priority, position LIMIT 1").fetchone()
+            if not row:
+                return None
+            conn.execute("UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                         "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                         (worker_id, now + self.lease_seconds, now, row[0]))
+        return row[0], json.loads(row[1])
+
+    def finish(self, job_id, worker_id, result):
+        """
+        提交任务结果，result 为None表示该产品无法处理
+
+        Returns:
+            bool: 租约仍属于该工作进程并成功提交时返回True
+        """
+        status = 'done' if result is not None else 'failed'
+        with self.transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 time.time(), job_id, worker_id)
+            ).rowcount
+        return updated == 1
+
+    def counts(self):
+        """各状态的任务数量，同时回收过期租约，保证工作进程全部退出后也能收尾"""
+        with self.transaction() as conn:
+            self.reclaim_expired(conn)
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def results(self):
+        """按列表顺序逐条返回已完成任务的结果"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT result FROM jobs WHERE status = 'done' ORDER BY position").fetchall()
+        for (result,) in rows:
+            yield json.loads(result)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class CrawlMetrics:
+    """按阶段统计耗时直方图和计数器，输出JSON运行报告和Prometheus文本文件"""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 45, 90)
+    MAX_SAMPLES = 10000  # 每个阶段保留的样本数上限，用于计算分位数
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds):
+        """记录一次阶段耗时"""
+        with self.lock:
+            hist = self.histograms.setdefault(
+                stage, {'count': 0, 'sum': 0.0, 'buckets': [0] * len(self.BUCKETS), 'samples': []})
+            hist['count'] += 1
+            hist['sum'] += seconds
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    hist['buckets'][i] += 1
+            if len(hist['samples']) < self.MAX_SAMPLES:
+                hist['samples'].append(seconds)
+
+    def inc(self, counter, value=1):
+        """累加计数器"""
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @contextmanager
+    def timer(self, stage):
+        """统计代码块耗时，异常时同样记录"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.time() - start)
+
+    @staticmethod
+    def percentile(samples, q):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    def summary(self):
+        """生成运行汇总"""
+        with self.lock:
+            stages = {}
+            for stage, hist in self.histograms.items():
+                samples = hist['samples']
+                stages[stage] = {
+                    'count': hist['count'],
+                    'total_seconds': round(hist['sum'], 3),
+                    'mean_seconds': round(hist['sum'] / hist['count'], 3),
+                    'p50_seconds': round(self.percentile(samples, 0.5), 3),
+                    'p95_seconds': round(self.percentile(samples, 0.95), 3),
+                    'max_seconds': round(max(samples), 3)
+                }
+            return {
+                'started_at': datetime.fromtimestamp(self.started).isoformat(),
+                'duration_seconds': round(time.time() - self.started, 3),
+                'stages': stages,
+                'counters': dict(self.counters)
+            }
+
+    def write_json(self, path, extra=None):
+        """写出JSON运行报告"""
+        report = self.summary()
+        report.update(extra or {})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path):
+        """写出 node_exporter textfile 格式的指标，先写临时文件再原子替换"""
+        lines = [
+            '# HELP ai_crawler_stage_seconds Time spent per crawler stage.',
+            '# TYPE ai_crawler_stage_seconds histogram'
+        ]
+        with self.lock:
+            for stage, hist in sorted(self.histograms.items()):
+                for bound, count in zip(self.BUCKETS, hist['buckets']):
+                    lines.append(f'ai_crawler_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'ai_crawler_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist["count"]}')
+                lines.append(f'ai_crawler_stage_seconds_sum{{stage="{stage}"}} {hist["sum"]:.6f}')
+                lines.append(f'ai_crawler_stage_seconds_count{{stage="{stage}"}} {hist["count"]}')
+            lines.append('# HELP ai_crawler_events_total Crawler event counters.')
+            lines.append('# TYPE ai_crawler_events_total counter')
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f'ai_crawler_events_total{{event="{counter}"}} {value}')
+        lines.append('# HELP ai_crawler_last_run_timestamp_seconds Time the last run report was written.')
+        lines.append('# TYPE ai_crawler_last_run_timestamp_seconds gauge')
+        lines.append(f'ai_crawler_last_run_timestamp_seconds {time.time():.0f}')
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+
+class SelectorEngine:
+    """
+    候选选择器的组合查找：每次轮询用一次JS同时计算所有XPath，
+    按历史命中率排序并持久化命中统计，排在前面的选择器优先
+    """
+
+    def __init__(self, stats_path=None, fallback_grace=1.0):
+        self.stats_path = stats_path
+        self.fallback_grace = fallback_grace
+        self.lock = threading.Lock()
+        self.stats = {}
+        if stats_path and os.path.exists(stats_path):
+            try:
+                with open(stats_path, 'r', encoding='utf-8') as f:
+                    self.stats = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"读取选择器统计失败，重新开始统计: {str(e)}")
+
+    def ordered(self, group, candidates):
+        """按命中率（加一平滑）从高到低排序，命中率相同保持原顺序"""
+        with self.lock:
+            stats = self.stats.get(group, {})
+
+            def hit_rate(selector):
+                s = stats.get(selector, {})
+                return (s.get('hits', 0) + 1) / (s.get('hits', 0) + s.get('misses', 0) + 2)
+
+            return sorted(candidates, key=hit_rate, reverse=True)
+
+    def record(self, group, ordered, hit_index):
+        """记录命中的选择器，排在它前面（或全部未命中时所有）的候选记为未命中"""
+        with self.lock:
+            stats = self.stats.setdefault(group, {})
+            missed = ordered if hit_index is None else ordered[:hit_index]
+            for selector in missed:
+                stats.setdefault(selector, {'hits': 0, 'misses': 0})['misses'] += 1
+            if hit_index is not None:
+                stats.setdefault(ordered[hit_index], {'hits': 0, 'misses': 0})['hits'] += 1
+
+    def find(self, driver, group, candidates, timeout, clickable=False):
+        """
+        查找第一个匹配的元素
+
+        排名靠后的候选只在查找开始 fallback_grace 秒后才接受，
+        给排名靠前的候选留出渲染时间，而不是每个候选各等一个完整超时。
+
+        Args:
+            driver: 浏览器实例
+            group: 选择器分组名称，用于统计
+            candidates: XPath 候选列表
+            timeout: 总超时时间（秒）
+            clickable: 是否要求元素可见且未禁用
+
+        Returns:
+            tuple: (元素, 命中的选择器)，超时返回 (None, None)
+        """
+        ordered = self.ordered(group, candidates)
+        start = time.time()
+        while True:
+            match = driver.execute_script(SELECTOR_FIND_SCRIPT, ordered, clickable)
+            elapsed = time.time() - start
+            if match and (match[1] == 0 or elapsed >= self.fallback_grace):
+                element, index = match
+                self.record(group, ordered, index)
+                return element, ordered[index]
+            if elapsed >= timeout:
+                self.record(group, ordered, None)
+                return None, None
+            time.sleep(0.1)
+
+    def save(self):
+        """原子写出命中统计，供下次运行排序"""
+        if not self.stats_path:
+            return
+        with self.lock:
+            tmp_path = f"{self.stats_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.stats_path)
+
+
+class StreamWriter:
+    """逐条追加写入NDJSON，并以原子方式保存断点（已连续处理到的卡片序号）"""
+
+    def __init__(self, path, checkpoint_path, resume=False):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.lock = threading.Lock()
+        self.done = set()
+        self.last_index = -1
+        self.written = 0
+        self.bytes_written = 0
+        # 断点续爬时追加写入，否则清空旧文件
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self.file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # 崩溃时残留的半行单独成行，读取时会被忽略
+                    self.file.write('\n')
+
+    @staticmethod
+    def read_records(path):
+        """逐条读取NDJSON中的记录，忽略崩溃时可能残留的不完整末行"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logging.warning(f"忽略不完整的NDJSON行: {line[:80]}")
+
+    def write(self, record, index=None):
+        """
+        追加一条记录并落盘
+
+        Args:
+            record: 产品数据，为None时只更新断点
+            index: 卡片在列表中的序号
+        """
+        with self.lock:
+            if record is not None:
+                line = json.dumps(record, ensure_ascii=False) + '\n'
+                self.file.write(line)
+                self.file.flush()
+                self.bytes_written += len(line.encode('utf-8'))
+                os.fsync(self.file.fileno())
+                self.written += 1
+            if index is not None:
+                self.done.add(index)
+                while self.last_index + 1 in self.done:
+                    self.last_index += 1
+                    self.done.discard(self.last_index)
+                self.save_checkpoint()
+
+    def save_checkpoint(self):
+        """先写临时文件并fsync，再原子替换，避免崩溃时留下半个断点文件"""
+        checkpoint = {
+            'last_index': self.last_index,
+            'written': self.written,
+            'stream_file': self.path,
+            'updated_at': datetime.now().isoformat()
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class ResultExporter:
+    """
+    把同一批产品记录导出为 Parquet、NDJSON.gz 和 SQLite，供下游按标签、关注者数等查询
+
+    每次运行按抓取日期追加一个分区（Hive 风格的 crawled_date=YYYY-MM-DD 目录），
+    文件名带运行ID，历史运行不会被覆盖；SQLite 导出按运行ID追加到同一个数据库。
+    """
+
+    FORMATS = ('parquet', 'ndjson.gz', 'sqlite')
+    PARQUET_BATCH_SIZE = 5000
+
+    def __init__(self, directory, formats, run_id, crawled_date):
+        self.directory = directory
+        self.formats = formats
+        self.run_id = run_id
+        self.crawled_date = crawled_date
+
+    def partition_path(self, fmt, extension):
+        directory = os.path.join(self.directory, fmt.split('.')[0], f'crawled_date={self.crawled_date}')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f'run-{self.run_id}.{extension}')
+
+    def export(self, records):
+        """
+        按配置的格式导出
+
+        Args:
+            records: 无参函数，每次调用返回一个新的记录迭代器（各格式分别流式读取）
+
+        Returns:
+            dict: 格式 -> 写入的文件路径
+        """
+        written = {}
+        for fmt in self.formats:
+            if fmt not in self.FORMATS:
+                logging.warning(f"不支持的导出格式: {fmt}")
+                continue
+            try:
+                if fmt == 'parquet':
+                    path = self.export_parquet(records())
+                elif fmt == 'ndjson.gz':
+                    path = self.export_ndjson_gz(records())
+                else:
+                    path = self.export_sqlite(records())
+            except Exception as e:
+                logging.error(f"导出 {fmt} 失败: {str(e)}")
+                continue
+            if path:
+                written[fmt] = path
+                logging.info(f"已导出 {fmt}: {path}")
+        return written
+
+    def export_ndjson_gz(self, records):
+        path = self.partition_path('ndjson.gz', 'ndjson.gz')
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, path)
+        return path
+
+    def parquet_schema(self):
+        labels = pa.dictionary(pa.int32(), pa.string())
+        return pa.schema([
+            ('name', pa.string()),
+            ('url', pa.string()),
+            ('product_url', pa.string()),
+            ('description', pa.string()),
+            ('thumbnail', pa.string()),
+            ('followers', pa.int64()),
+            ('tags', pa.list_(labels)),
+            ('topics', pa.list_(labels)),
+            ('category', labels),
+            ('source', labels),
+            ('screenshot', pa.string()),
+            ('screenshot_change', pa.float64()),
+            ('crawled_at', pa.string()),
+            ('run_id', labels)
+        ])
+
+    def parquet_batch(self, schema, records):
+        """把一批记录转换为 RecordBatch，标签等低基数字段使用字典编码"""
+        columns = []
+        for field in schema:
+            values = [self.run_id if field.name == 'run_id' else record.get(field.name) for record in records]
+            if pa.types.is_list(field.type):
+                offsets = [0]
+                flat = []
+                for value in values:
+                    flat.extend(value or [])
+                    offsets.append(len(flat))
+                items = pa.array(flat, type=pa.string()).dictionary_encode()
+                columns.append(pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), items))
+            elif pa.types.is_dictionary(field.type):
+                columns.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                columns.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    def export_parquet(self, records):
+        if pa is None:
+            logging.warning("未安装 pyarrow，跳过 Parquet 导出")
+            return None
+        path = self.partition_path('parquet', 'parquet')
+        tmp_path = f"{path}.tmp"
+        schema = self.parquet_schema()
+        with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= self.PARQUET_BATCH_SIZE:
+                    writer.write_batch(self.parquet_batch(schema, batch))
+                    batch = []
+            if batch:
+                writer.write_batch(self.parquet_batch(schema, batch))
+        os.replace(tmp_path, path)
+        return path
+
+    def export_sqlite(self, records):
+        path = os.path.join(self.directory, 'ai_tools.sqlite')
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS tools (
+                        id INTEGER PRIMARY KEY,
+                        run_id TEXT,
+                        crawled_date TEXT,
+                        name TEXT,
+                        url TEXT,
+                        product_url TEXT,
+                        description TEXT,
+                        thumbnail TEXT,
+                        followers INTEGER,
+                        category TEXT,
+                        source TEXT,
+                        topics TEXT,
+                        screenshot TEXT,
+                        screenshot_change REAL,
+                        crawled_at TEXT
+                    )
+                """)
+                conn.execute("CREATE TABLE IF NOT EXISTS tool_tags (tool_id INTEGER, tag TEXT)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_tools_url ON tools(url)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_tools_name ON tools(name)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_tools_date ON tools(crawled_date, followers)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_tool_tags_tag ON tool_tags(tag, tool_id)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_tool_tags_tool ON tool_tags(tool_id)")
+
+                # 同一运行重复导出时先删除旧行，保证幂等
+                conn.execute("DELETE FROM tool_tags WHERE tool_id IN (SELECT id FROM tools WHERE run_id = ?)",
+                             (self.run_id,))
+                conn.execute("DELETE FROM tools WHERE run_id = ?", (self.run_id,))
+                for record in records:
+                    cursor = conn.execute(
+                        "INSERT INTO tools (run_id, crawled_date, name, url, product_url, description, thumbnail, "
+                        "followers, category, source, topics, screenshot, screenshot_change, crawled_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (self.run_id, self.crawled_date, record.get('name'), record.get('url'),
+                         record.get('product_url'), record.get('description'), record.get('thumbnail'),
+                         record.get('followers'), record.get('category'), record.get('source'),
+                         json.dumps(record.get('topics') or [], ensure_ascii=False), record.get('screenshot'),
+                         record.get('screenshot_change'), record.get('crawled_at'))
+                    )
+                    conn.executemany("INSERT INTO tool_tags (tool_id, tag) VALUES (?, ?)",
+                                     [(cursor.lastrowid, tag) for tag in record.get('tags') or []])
+        finally:
+            conn.close()
+        return path
 
 
 class AIToolsCrawler:
-    def __init__(self, output_file='ai_tools.json'):
-        """初始化爬虫"""
+    def __init__(self, output_file='ai_tools.json', config=None, start_browser=True):
+        """
+        初始化爬虫
+
+        Args:
+            output_file: JSON输出文件
+            config: 覆盖默认配置的字典
+            start_browser: 为False时不启动主浏览器（如只压实NDJSON或离线解析）
+        """
         self.config = {
             'max_retries': 5,
-            'retry_delay': 10,
+            'retry_delay': 2,  # 指数退避的基准等待（秒），实际等待在 0 到 retry_delay * 2^n 之间随机
+            'retry_max_delay': 30,  # 单次退避等待上限（秒）
+            # 页面加载超时单次就要等 page_load_timeout，单独限制尝试次数；第三方网站超时只尝试一次
+            'timeout_attempts': 2,
+            'external_timeout_attempts': 1,
+            'circuit_failure_threshold': 3,  # 同一域名连续失败多少次后熔断，应小于 max_retries
+            'circuit_cooldown': 300,  # 熔断后多久放行一次试探请求（秒）
             'scroll_count': 1,
-            'min_request_interval': 3.0,
             'timeout': 45,
             'page_load_timeout': 90,
-            'screenshots_dir': 'screenshots'  # 添加截图保存目录
+            'screenshots_dir': 'screenshots',  # 添加截图保存目录
+            'base_url': 'https://www.producthunt.com',  # ProductHunt站点地址，基准测试时指向本地服务
+            'workers': 1,  # 详情页/截图并发浏览器数量，1 表示串行
+            # 列表页卡片提取方式：dom 每次滚动后在浏览器内只提取新卡片；soup 滚动结束后整页解析
+            'extraction_mode': 'soup',
+            'listing_parser': 'html.parser',  # soup 模式和离线HTML的解析器：html.parser/lxml/selectolax
+            # 各来源要爬取的话题及其分类
+            'sources': {'producthunt': {'artificial-intelligence': 'AI'}},
+            'priority_by_followers': True,  # 关注者多的产品优先处理
+            # 按域名的令牌桶限速（子域名共用），rate 为每秒请求数，jitter 为额外随机等待上限
+            'host_rate_limits': {'producthunt.com': {'rate': 1 / 3.0, 'burst': 1, 'jitter': 1.0}},
+            'default_rate_limit': None,  # 未配置域名的限速，None 表示不限速
+            'canonical_lookup': True,  # 请求网站首页读取 canonical/og:url，作为去重和缓存的规范地址
+            'http_fast_path': True,  # 先用 requests 解析详情页，失败再回退到浏览器
+            'http_timeout': 15,
+            'cache_file': 'crawl_cache.sqlite',  # 设为 None 关闭缓存
+            'cache_url_ttl': 7 * 24 * 3600,  # 真实URL缓存有效期（秒）
+            'cache_screenshot_ttl': 24 * 3600,  # 截图缓存有效期（秒）
+            'cache_max_entries': 10000,
+            'incremental': False,  # 只处理相对上次输出新增或变化的产品
+            'incremental_keep_removed': True,  # 合并结果中保留本次未出现的历史产品
+            'delta_file': 'ai_tools.delta.json',
+            'stream_file': 'ai_tools.ndjson',  # 逐条写入的NDJSON，设为 None 关闭
+            'checkpoint_file': 'crawl_checkpoint.json',
+            'resume': False,  # 断点续爬：跳过NDJSON中已写入的产品
+            'queue_file': 'crawl_queue.sqlite',  # 分布式模式的任务队列（协调进程和工作进程共享）
+            'queue_lease_seconds': 600,  # 工作进程领取任务的租约时长，超时未完成的任务会被重新分配
+            'queue_max_attempts': 3,  # 同一任务最多被领取的次数
+            'queue_poll_interval': 2,  # 队列暂时为空时的轮询间隔（秒）
+            'bounded_memory': False,  # 边滚动边处理，已提取的卡片从DOM中清空，记录只写NDJSON不保留在内存
+            'card_queue_size': 20,  # 有界内存模式下等待处理的卡片上限，队列满时暂停滚动
+            # 各场景等待页面就绪的最长时间（秒）
+            # 各场景最长等待（秒），不超过原先的固定等待时间
+            'readiness_timeouts': {'homepage': 2, 'tab_switch': 3, 'scroll': 2, 'screenshot': 3},
+            'readiness_quiet_period': 0.5,  # 各信号保持不变多久视为页面稳定
+            'resource_policy': True,  # 按导航类型拦截图片、字体、统计脚本等资源
+            'screenshot_workers': 0,  # 独立截图流水线的浏览器数量，0 表示在爬取循环中直接截图
+            'image_processes': None,  # 图片压缩进程数，None 为CPU核数，0 表示在当前线程压缩
+            'screenshot_formats': ['png'],  # 可选 png/webp/jpeg，第一个作为记录中的截图文件
+            'screenshot_quality': 80,
+            'screenshot_thumbnails': [],  # 缩略图尺寸，如 [(480, 270)]
+            'screenshot_change_threshold': 0.05,  # 感知哈希差异不超过该比例时视为截图没有变化
+            'selector_stats_file': 'selector_stats.json',  # 选择器命中统计，用于调整候选顺序
+            'selector_fallback_grace': 1.0,  # 排名靠后的选择器至少等待多久才接受（秒）
+            'tab_max_uses': 50,  # 工作标签页导航多少次后关闭重开，0 表示不回收
+            'driver_memory_limit_mb': 1024,  # 浏览器JS堆超过该值时重启，None 表示不检查
+            # 额外导出格式：parquet（需要 pyarrow）、ndjson.gz、sqlite，按抓取日期分区追加
+            'export_formats': [],
+            'export_dir': 'exports',
+            'metrics_file': 'crawl_report.json',  # 运行报告，设为 None 关闭
+            'prometheus_textfile': None  # Prometheus textfile 输出路径，如 /var/lib/node_exporter/ai_crawler.prom
         }
+        self.config.update(config or {})
 
         # 确保截图目录存在
         os.makedirs(self.config['screenshots_dir'], exist_ok=True)
 
         self.output_file = output_file
         self.tools_data = []
+        self.saved_count = 0
+        self.previous_data = []
+        self.previous_index = {}
+        self.incremental_plan = {}
+        self.stream = None
+        self.resumed_records = {}
+        self.last_error = None
         self.setup_logging()
-        self.setup_selenium()
-        self.last_request_time = 0
+        self.browser = BrowserManager(self.create_driver, self.config['tab_max_uses'],
+                                      self.config['driver_memory_limit_mb'])
+        self.main_session = None
+        if start_browser:
+            self.setup_selenium()
+        self.session = self.create_http_session()
+        self.cache = None
+        if self.config['cache_file']:
+            self.cache = CrawlCache(
+                self.config['cache_file'],
+                ttls={'url': self.config['cache_url_ttl'], 'screenshot': self.config['cache_screenshot_ttl']},
+                max_entries=self.config['cache_max_entries']
+            )
+        self.metrics = CrawlMetrics()
+        self.selectors = SelectorEngine(self.config['selector_stats_file'], self.config['selector_fallback_grace'])
+        self.rate_limiter = HostRateLimiter(self.config['host_rate_limits'], self.config['default_rate_limit'])
+        self.breaker = CircuitBreaker(self.config['circuit_failure_threshold'], self.config['circuit_cooldown'])
+        # 来源名称到列表页收集方法的映射
+        self.sources = {'producthunt': self.crawl_producthunt}
+        self.stats_lock = threading.Lock()
+        self.readiness_stats = {}
+        self.resource_stats = {}
+        self.screenshot_hashes = {}  # 本进程已写入（或正在写入）的截图内容哈希
+        self.screenshot_changes = {}  # 规范网站去重键 -> 视觉变化分数
+        self.debug_screenshots = {}
+        self.redirect_memo = {}  # (短链域名, 路径) -> 规范网站地址
+        self.site_screenshots = {}  # 规范网站去重键 -> 截图文件名或 Future
+        self.screenshot_pipeline = None
+        self.image_pool = None
 
     def setup_logging(self):
         """配置日志系统"""
@@ -54,6 +1575,15 @@ class AIToolsCrawler:
 
     def setup_selenium(self):
         """配置Selenium无头浏览器"""
+        self.main_session = self.browser.group('main', 1, separate_work_tab=True)[0]
+
+    @property
+    def driver(self):
+        """主浏览器实例；重启后自动指向新的进程"""
+        return self.main_session.driver if self.main_session else None
+
+    def create_driver(self):
+        """创建一个新的无头Chrome实例"""
         chrome_options = Options()
         chrome_options.add_argument('--headless')
         chrome_options.add_argument('--no-sandbox')
@@ -66,441 +1596,1809 @@ class AIToolsCrawler:
         chrome_options.add_argument('--disable-infobars')
         chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
         chrome_options.add_experimental_option('useAutomationExtension', False)
-        chrome_options.add_argument(
-            'user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        if self.config['resource_policy']:
+            # 性能日志用于统计各资源策略的流量和被拦截的请求
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        chrome_options.add_argument(f'user-agent={USER_AGENT}')
+
+        # 添加新的配置项
+        chrome_options.add_argument('--disable-web-security')
+        chrome_options.add_argument('--ignore-certificate-errors')
+        chrome_options.add_argument('--allow-running-insecure-content')
+        chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
+        
+        driver = webdriver.Chrome(options=chrome_options)
+        driver.set_page_load_timeout(self.config['page_load_timeout'])
+        driver.set_script_timeout(self.config['page_load_timeout'])
+        return driver
+
+    def create_http_session(self):
+        """创建带连接池的 requests 会话，供各工作线程共享"""
+        session = requests.Session()
+        pool_size = max(10, self.config['workers'] * 2)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9'
+        })
+        return session
+
+    def wait_for_host(self, url):
+        """按域名令牌桶限速，未配置限速的域名直接返回"""
+        waited = self.rate_limiter.wait(url)
+        if waited:
+            self.metrics.observe('politeness_wait', waited)
+
+    def retry_wait(self, kind, attempt, started, session=None):
+        """
+        一次失败后到下一次尝试之前的处理，并按错误类型统计重试耗时
+
+        浏览器崩溃时重启后立即重试；暂时性错误按带抖动的指数退避等待（full jitter）。
+        """
+        if kind == 'driver_crash':
+            if session:
+                self.browser.restart(session)
+        else:
+            delay = random.uniform(0, min(self.config['retry_max_delay'], self.config['retry_delay'] * 2 ** attempt))
+            time.sleep(delay)
+        self.metrics.observe(f'retry_{kind}', time.time() - started)
+
+    def with_retries(self, url, label, action, driver=None):
+        """
+        按错误类型重试一次页面操作
+
+        Args:
+            url: 目标URL，用于按域名熔断
+            label: 日志中的操作名称
+            action: 接收浏览器实例的函数，失败时抛出异常
+            driver: 使用的浏览器实例，崩溃重启后传入新实例
+
+        Returns:
+            action 的返回值；域名已熔断、错误不可重试或重试次数用尽时返回None
+        """
+        own_host = CircuitBreaker.host_of(self.config['base_url'])
+        host = self.breaker.host_of(url)
+        timeout_attempts = self.config['timeout_attempts' if host == own_host or host.endswith(f".{own_host}")
+                                       else 'external_timeout_attempts']
+        if not self.breaker.allow(url):
+            logging.warning(f"{self.breaker.host_of(url)} 已熔断，跳过{label}: {url}")
+            self.metrics.inc('circuit_skips')
+            return None
+
+        session = self.browser.session_for(driver) if driver else None
+        try:
+            for attempt in range(self.config['max_retries']):
+                started = time.time()
+                try:
+                    result = action(session.driver if session else driver)
+                    self.breaker.record_success(url)
+                    return result
+                except Exception as e:
+                    kind = classify_error(e)
+                    self.metrics.inc(f'errors_{kind}')
+                    logging.warning(f"{label}失败（{kind}，第 {attempt + 1} 次）{url}: {str(e)}")
+                    if kind in TRANSIENT_ERRORS and self.breaker.record_failure(url):
+                        logging.error(f"{self.breaker.host_of(url)} 连续失败，熔断 {self.config['circuit_cooldown']}s")
+                        self.metrics.inc('circuit_opened')
+                    retryable = kind in TRANSIENT_ERRORS or (kind == 'driver_crash' and session)
+                    attempts = timeout_attempts if kind == 'timeout' else self.config['max_retries']
+                    if not retryable or attempt >= attempts - 1 or self.breaker.is_open(url):
+                        return None
+                    self.retry_wait(kind, attempt, started, session)
+                    self.wait_for_host(url)
+            return None
+        finally:
+            # 本线程持有的试探名额没有得出结论时交还
+            self.breaker.release(url)
+
+    def check_bot_block(self, driver):
+        """页面标题像验证页或拦截页时抛出 bot_block 错误"""
+        title = driver.title or ''
+        if BOT_BLOCK_PATTERN.search(title):
+            raise CrawlError('bot_block', f"页面疑似被拦截: {title}")
+
+    def wait_for_page_ready(self, driver, label, legacy_sleep, card_selector=None, baseline=None):
+        """
+        基于页面真实信号等待就绪，页面稳定后立即返回
+
+        信号包括：document.readyState、已完成的请求数（网络空闲）、DOM变更计数、
+        卡片数量以及视口内图片是否加载完成。所有信号在 readiness_quiet_period 内
+        保持不变即视为稳定，最长等待 readiness_timeouts 中该场景的时间。
+
+        Args:
+            driver: 浏览器实例
+            label: 等待场景，对应 readiness_timeouts 中的超时配置
+            legacy_sleep: 原先的固定等待秒数，用于统计节省的时间
+            card_selector: 需要统计数量的卡片CSS选择器
+            baseline: 上一次的页面状态，用于判断高度或卡片数是否有变化
+
+        Returns:
+            dict: 最后一次采样的页面状态，changed 表示相对 baseline 是否有变化
+        """
+        timeout = self.config['readiness_timeouts'].get(label, self.config['timeout'])
+        quiet_period = self.config['readiness_quiet_period']
+        start = time.time()
+        deadline = start + timeout
+        last_signature = None
+        stable_since = start
+        state = {}
+
+        while True:
+            try:
+                state = driver.execute_script(READINESS_SCRIPT, card_selector)
+            except Exception as e:
+                logging.debug(f"[{label}] 读取页面状态失败: {str(e)}")
+                state = {}
+            now = time.time()
+
+            changed = baseline is None or (
+                state.get('height') != baseline.get('height') or state.get('cards') != baseline.get('cards'))
+            signature = (state.get('resources'), state.get('mutations'), state.get('cards'), state.get('height'))
+            if signature != last_signature:
+                last_signature = signature
+                stable_since = now
+
+            # 给定 baseline 时，保持不变且安静了 quiet_period 同样视为稳定（如已滚动到底部）
+            settled = (state.get('ready') == 'complete' and state.get('pendingImages') == 0
+                       and now - stable_since >= quiet_period)
+            if settled or now >= deadline:
+                break
+            time.sleep(0.1)
+
+        elapsed = time.time() - start
+        state['changed'] = changed
+        saved = legacy_sleep - elapsed
+        with self.stats_lock:
+            stats = self.readiness_stats.setdefault(label, {'waits': 0, 'elapsed': 0.0, 'saved': 0.0})
+            stats['waits'] += 1
+            stats['elapsed'] += elapsed
+            stats['saved'] += saved
+        self.metrics.observe(f'wait_{label}', elapsed)
+        status = '已就绪' if settled else '等待超时'
+        logging.info(f"[{label}] 页面{status}，耗时 {elapsed:.2f}s，较固定等待 {legacy_sleep}s 节省 {saved:.2f}s")
+        return state
+
+    def log_readiness_summary(self):
+        """输出各等待场景累计节省的时间"""
+        for label, stats in self.readiness_stats.items():
+            logging.info(f"[{label}] 共等待 {stats['waits']} 次，总耗时 {stats['elapsed']:.1f}s，"
+                         f"累计节省 {stats['saved']:.1f}s")
+
+    def apply_resource_profile(self, driver, profile):
+        """通过CDP为当前标签页设置需要拦截的资源URL"""
+        if not self.config['resource_policy']:
+            return
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': RESOURCE_PROFILES[profile]})
+        except Exception as e:
+            logging.debug(f"设置资源拦截策略 {profile} 失败: {str(e)}")
+
+    def record_resource_usage(self, driver, profile):
+        """读取性能日志中的网络事件，按资源策略累计传输字节数和被拦截的请求数"""
+        if not self.config['resource_policy']:
+            return
+        try:
+            entries = driver.get_log('performance')
+        except Exception as e:
+            logging.debug(f"读取性能日志失败: {str(e)}")
+            return
+
+        transferred = 0
+        requests_count = 0
+        blocked = 0
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            if message['method'] == 'Network.loadingFinished':
+                transferred += message['params'].get('encodedDataLength', 0)
+                requests_count += 1
+            elif message['method'] == 'Network.loadingFailed' and message['params'].get('blockedReason'):
+                blocked += 1
+
+        with self.stats_lock:
+            stats = self.resource_stats.setdefault(
+                profile, {'navigations': 0, 'bytes': 0, 'requests': 0, 'blocked': 0})
+            stats['navigations'] += 1
+            stats['bytes'] += transferred
+            stats['requests'] += requests_count
+            stats['blocked'] += blocked
+
+    def log_resource_summary(self):
+        """输出各资源策略的流量，并按未拦截时的平均请求大小估算节省的字节数"""
+        total_requests = sum(s['requests'] for s in self.resource_stats.values())
+        total_bytes = sum(s['bytes'] for s in self.resource_stats.values())
+        full = self.resource_stats.get('screenshot')
+        if full and full['requests']:
+            avg_request_bytes = full['bytes'] / full['requests']
+        else:
+            avg_request_bytes = total_bytes / total_requests if total_requests else 0
+
+        for profile, stats in self.resource_stats.items():
+            per_navigation = stats['bytes'] / stats['navigations'] / 1024
+            saved = stats['blocked'] * avg_request_bytes / 1024 / 1024
+            logging.info(f"[资源策略 {profile}] 页面 {stats['navigations']} 次，平均每页 {per_navigation:.0f} KB，"
+                         f"拦截请求 {stats['blocked']} 个，估计节省 {saved:.1f} MB")
+
+    def scroll_page(self, extract=False, on_cards=None):
+        """
+        通过滚动加载更多内容
+
+        Args:
+            extract: 为True时每次滚动后在浏览器内提取新出现的卡片
+            on_cards: 有界内存模式的回调，每批新卡片提取后立即交给它并清空其DOM子树，
+                回调阻塞时滚动随之暂停
+
+        Returns:
+            list: extract 为True且没有回调时返回提取到的卡片信息，否则为空列表
+        """
+        SCROLL_PAUSE_TIME = 2  # 原固定等待时间，仅用于统计节省的时间
+        max_attempts = self.config['scroll_count']
+        attempts = 0
+        card_infos = []
+
+        def take_new_cards():
+            batch = self.extract_new_cards(self.driver, release=on_cards is not None)
+            if on_cards:
+                on_cards(batch)
+            else:
+                card_infos.extend(batch)
+
+        state = self.driver.execute_script(READINESS_SCRIPT, PRODUCT_CARD_SELECTOR)
+        if extract:
+            take_new_cards()
+
+        while attempts < max_attempts:
+            try:
+                # 滚动到页面底部
+                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+
+                # 等待新卡片加载完成；高度和卡片数都没有变化说明已经到底部
+                state = self.wait_for_page_ready(self.driver, 'scroll', SCROLL_PAUSE_TIME,
+                                                 card_selector=PRODUCT_CARD_SELECTOR, baseline=state)
+                logging.info(f"已加载 {state.get('cards', 0)} 个产品")
+                if extract and state['changed']:
+                    take_new_cards()
+
+                if not state['changed']:
+                    logging.info("已到达页面底部")
+                    break
+
+                attempts += 1
+                
+            except Exception as e:
+                # 浏览器崩溃或重启后页面已经丢失，不能当作到达底部
+                if classify_error(e) == 'driver_crash':
+                    raise
+                logging.warning(f"滚动加载更多内容时出错: {str(e)}")
+                break
+        
+        logging.info(f"完成滚动加载操作，共滚动 {attempts} 次")
+        return card_infos
+
+    def extract_website_link(self, soup):
+        """从详情页静态HTML或内嵌JSON中提取 Visit website 链接"""
+        for link in soup.find_all('a', href=True):
+            if 'Visit website' in link.get_text():
+                return link['href']
+
+        link = soup.find('a', href=True, class_=re.compile(r'styles_websiteButton'))
+        if link:
+            return link['href']
+
+        link = soup.find('a', href=True, attrs={'data-test': re.compile(r'website-link')})
+        if link:
+            return link['href']
+
+        # Next.js/Apollo 内嵌数据中的 websiteUrl 字段
+        for script in soup.find_all('script'):
+            text = script.string or ''
+            match = re.search(r'"websiteUrl"\s*:\s*"((?:[^"\\]|\\.)+)"', text)
+            if match:
+                return json.loads(f'"{match.group(1)}"')
+
+        return None
+
+    def follow_redirects(self, url, read_head=False):
+        """
+        通过连接池跟随跳转链，返回最终地址；read_head 为True时同时读取页面开头用于解析 canonical
+
+        Returns:
+            tuple: (最终URL, 页面开头的HTML或None)；请求失败时最终URL为None
+        """
+        self.wait_for_host(url)
+        try:
+            if not read_head:
+                response = self.session.head(url, allow_redirects=True, timeout=self.config['http_timeout'])
+                response.close()
+                if response.status_code not in (403, 405):
+                    return response.url, None
+            # 部分服务不支持HEAD，改用GET并且只读取正文开头
+            response = self.session.get(url, allow_redirects=True, stream=True,
+                                        timeout=self.config['http_timeout'])
+            try:
+                html = None
+                if response.ok and 'html' in response.headers.get('Content-Type', ''):
+                    head = response.raw.read(CANONICAL_READ_LIMIT, decode_content=True)
+                    html = head.decode(response.encoding or 'utf-8', errors='replace')
+                return response.url, html
+            finally:
+                response.close()
+        except requests.RequestException as e:
+            logging.debug(f"跟随跳转失败 {url}: {str(e)}")
+            return None, None
+
+    def resolve_canonical_url(self, url):
+        """
+        解析网站的规范地址：跟随短链和跳转链接，读取 canonical/og:url，并去掉跟踪参数
+
+        跳转链接可能依赖 ref、utm_* 等参数，按原样请求，只清理最终地址；
+        短链按完整地址在进程内缓存，同一短链只成功解析一次，失败的解析不缓存。
+        """
+        url = url.strip()
+        redirect = is_redirect_link(url)
+        memo_key = None
+        if redirect:
+            memo_key = urlparse(url)._replace(fragment='').geturl()
+            with self.stats_lock:
+                memoized = self.redirect_memo.get(memo_key)
+            if memoized:
+                self.metrics.inc('redirect_memo_hits')
+                return memoized
+
+        if not (redirect or self.config['canonical_lookup']):
+            return clean_website_url(url)
+
+        with self.metrics.timer('resolve_canonical'):
+            final_url, html = self.follow_redirects(url, read_head=self.config['canonical_lookup'])
+            canonical = extract_canonical_url(html, final_url) if html else None
+        if final_url is None:
+            return clean_website_url(url)
+        resolved = clean_website_url(canonical or final_url)
+        if resolved != url:
+            logging.info(f"规范网站地址: {url} -> {resolved}")
+
+        if memo_key:
+            with self.stats_lock:
+                self.redirect_memo[memo_key] = resolved
+        return resolved
+
+    def screenshot_for_site(self, clean_url, tool_name, driver=None):
+        """
+        同一规范网站只截图一次，指向它的其他产品直接复用
+
+        Returns:
+            截图文件名；启用截图流水线时为结果是文件名的 Future
+        """
+        site_key = website_site_key(clean_url)
+        with self.stats_lock:
+            shared = self.site_screenshots.get(site_key)
+            if shared is None:
+                if self.screenshot_pipeline:
+                    shared = self.screenshot_pipeline.submit(clean_url, tool_name, cache_key=clean_url)
+                    self.site_screenshots[site_key] = shared
+                    return shared
+                # 先占位，并发处理同一网站的其他线程等待这次截图的结果
+                claim = self.site_screenshots[site_key] = Future()
+
+        if shared is not None:
+            logging.info(f"{tool_name} 与已处理的产品指向同一网站 {clean_url}，复用截图")
+            self.metrics.inc('canonical_duplicates')
+            if isinstance(shared, Future) and not self.screenshot_pipeline:
+                return shared.result()
+            return shared
+
+        try:
+            with self.metrics.timer('screenshot'):
+                filename = self.take_website_screenshot(clean_url, tool_name, driver=driver, cache_key=clean_url)
+        except Exception as e:
+            claim.set_exception(e)
+            raise
+        claim.set_result(filename)
+        return filename
+
+    def fetch_real_url_http(self, product_url):
+        """不启动浏览器，直接请求详情页获取真实URL，失败返回None"""
+        try:
+            with self.metrics.timer('detail_http'):
+                response = self.session.get(product_url, timeout=self.config['http_timeout'])
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.debug(f"HTTP请求详情页失败 {product_url}: {str(e)}")
+            self.metrics.inc('http_fast_path_misses')
+            return None
+
+        with self.metrics.timer('extract_detail'):
+            soup = BeautifulSoup(response.text, 'html.parser')
+            href = self.extract_website_link(soup)
+        if not href:
+            self.metrics.inc('http_fast_path_misses')
+            return None
+        self.metrics.inc('http_fast_path_hits')
+
+        real_url = urljoin(product_url, href)
+        logging.info(f"通过HTTP快速获取真实URL: {real_url}")
+        return real_url
+
+    def get_real_url(self, product_url, original_url, driver=None):
+        """获取产品真实URL，优先读取缓存"""
+        if self.cache:
+            cached = self.cache.get(product_url, 'url')
+            if cached and cached['real_url']:
+                logging.info(f"缓存命中真实URL: {cached['real_url']}")
+                self.metrics.inc('cache_hits_url')
+                return cached['real_url']
+
+        real_url = self.resolve_real_url(product_url, original_url, driver=driver)
+        if real_url and self.cache:
+            self.cache.put(product_url, 'url', real_url=real_url)
+        return real_url
+
+    def resolve_real_url(self, product_url, original_url, driver=None):
+        """通过产品详情页获取真实URL，并确保能够返回原始页面"""
+        self.wait_for_host(product_url)
+        if self.config['http_fast_path']:
+            real_url = self.fetch_real_url_http(product_url)
+            if real_url:
+                return real_url
+            logging.info(f"HTTP快速通道未能获取真实URL，回退到浏览器: {product_url}")
+
+        def load_detail(driver):
+            logging.info(f"访问产品详情页: {product_url}")
+            # 在预热好的工作标签页中加载产品详情页，不再每次开关标签页
+            with self.browser.work_tab(driver):
+                try:
+                    self.apply_resource_profile(driver, 'detail-link-only')
+                    with self.metrics.timer('navigation_detail'):
+                        driver.get(product_url)
+                    self.check_bot_block(driver)
+
+                    # 一次查询同时尝试所有候选选择器来定位 Visit Website 按钮
+                    with self.metrics.timer('selector_wait'):
+                        website_link, selector = self.selectors.find(
+                            driver, 'website_link', WEBSITE_LINK_SELECTORS, self.config['timeout'])
+                    if not website_link:
+                        raise CrawlError('missing_selector', "所有选择器均未找到 Visit website 链接")
+                    if selector != WEBSITE_LINK_SELECTORS[0]:
+                        self.metrics.inc('selector_fallbacks')
+
+                    real_url = website_link.get_attribute('href')
+                    if real_url:
+                        logging.info(f"成功获取真实URL: {real_url}")
+                    return real_url
+
+                finally:
+                    self.record_resource_usage(driver, 'detail-link-only')
+
+        return self.with_retries(product_url, '获取真实URL', load_detail, driver or self.driver)
+
+    def clear_browser_data(self):
+        """清理浏览器数据"""
+        try:
+            # 只清理 cookies
+            self.driver.delete_all_cookies()
+            logging.info("已清理cookies")
+            
+            # 只在正常页面（非data: URL）时清理存储
+            current_url = self.driver.current_url
+            if not current_url.startswith('data:'):
+                try:
+                    self.driver.execute_script("window.localStorage.clear();")
+                    self.driver.execute_script("window.sessionStorage.clear();")
+                    logging.info("已清理localStorage和sessionStorage")
+                except Exception as storage_error:
+                    logging.debug(f"清理存储时出错（非致命）: {str(storage_error)}")
+            
+        except Exception as e:
+            logging.warning(f"清理浏览器数据时出错: {str(e)}")
+            # 继续执行，不中断程序
+
+    def take_website_screenshot(self, url, tool_name, driver=None, cache_key=None):
+        """
+        获取网站截图，优先复用缓存中仍然有效的截图
+
+        Args:
+            url: 网站URL
+            tool_name: 工具名称（用于生成文件名）
+            driver: 使用的浏览器实例，默认为 self.driver
+            cache_key: 缓存键（规范网站地址），为None时不使用缓存
+
+        Returns:
+            str: 截图文件名，如果失败则返回None
+        """
+        cached = self.get_cached_screenshot(cache_key)
+        if cached:
+            return cached
+
+        png = self.capture_website_screenshot(url, driver=driver)
+        return self.store_screenshot(png, tool_name, cache_key)
+
+    def get_cached_screenshot(self, cache_key):
+        """返回缓存中仍然有效且文件存在的截图文件名"""
+        if not (self.cache and cache_key):
+            return None
+        cached = self.cache.get(cache_key, 'screenshot')
+        if cached and cached['screenshot'] and os.path.exists(
+                os.path.join(self.config['screenshots_dir'], cached['screenshot'])):
+            logging.info(f"缓存命中截图: {cached['screenshot']}")
+            self.metrics.inc('cache_hits_screenshot')
+            # 有效期内不重新截图，视为没有变化
+            self.record_screenshot_change(cache_key, 0.0)
+            return cached['screenshot']
+        return None
+
+    def capture_website_screenshot(self, url, driver=None):
+        """
+        访问网站并截图
+        
+        Args:
+            url: 网站URL
+            driver: 使用的浏览器实例，默认为 self.driver
+        
+        Returns:
+            bytes: PNG截图数据，如果失败则返回None
+        """
+        def load_website(driver):
+            # 工作标签页在打开时已经设置好窗口大小
+            with self.browser.work_tab(driver):
+                try:
+                    # 访问网站
+                    self.apply_resource_profile(driver, 'screenshot')
+                    with self.metrics.timer('navigation_screenshot'):
+                        driver.get(url)
+
+                    # 等待页面加载
+                    wait = WebDriverWait(driver, self.config['timeout'])
+                    wait.until(lambda driver: driver.execute_script("return document.readyState") == "complete")
+
+                    # 等待动态内容加载完成
+                    self.wait_for_page_ready(driver, 'screenshot', 3)
+
+                    # 截图只保存在内存中，压缩编码交给 store_screenshot
+                    with self.metrics.timer('screenshot_capture'):
+                        return driver.get_screenshot_as_png()
+
+                finally:
+                    self.record_resource_usage(driver, 'screenshot')
+
+        self.wait_for_host(url)
+        return self.with_retries(url, '截图', load_website, driver or self.driver)
+
+    def store_screenshot(self, png, tool_name, cache_key=None):
+        """
+        把截图存入按内容寻址的截图目录，并记录与该网站上一次截图相比的视觉变化
+
+        文件以PNG内容的哈希命名，相同内容只保存一份；与上一次截图的感知哈希差异不超过
+        screenshot_change_threshold 时视为没有变化，直接复用上一次的文件。
+
+        Args:
+            png: capture_website_screenshot 返回的PNG数据
+            tool_name: 工具名称（用于日志）
+            cache_key: 缓存键（规范网站地址）
+
+        Returns:
+            str: 主格式截图文件名，如果失败则返回None
+        """
+        if not png:
+            return None
+
+        try:
+            with self.metrics.timer('screenshot_phash'):
+                if self.image_pool:
+                    phash = self.image_pool.submit(perceptual_hash, png).result()
+                else:
+                    phash = perceptual_hash(png)
+        except Exception as e:
+            logging.error(f"计算截图感知哈希失败 {tool_name}: {str(e)}")
+            return None
+
+        previous = None
+        if self.cache and cache_key:
+            previous = self.cache.get(cache_key, 'screenshot', include_expired=True)
+        change = None
+        if previous and previous['phash']:
+            change = hash_distance(previous['phash'], phash)
+        self.record_screenshot_change(cache_key, change)
+        if change is None:
+            self.metrics.inc('screenshot_first_capture')
+        elif change > self.config['screenshot_change_threshold']:
+            self.metrics.inc('screenshot_changed')
+
+        if (change is not None and change <= self.config['screenshot_change_threshold']
+                and previous['screenshot']
+                and os.path.exists(os.path.join(self.config['screenshots_dir'], previous['screenshot']))):
+            logging.info(f"{tool_name} 截图与上次相比没有明显变化（{change:.2f}），复用 {previous['screenshot']}")
+            self.metrics.inc('screenshot_unchanged')
+            # 保留上一次的指纹作为基准，避免细微变化逐次累积而不被发现
+            self.cache.put(cache_key, 'screenshot', screenshot=previous['screenshot'],
+                           content_hash=previous['content_hash'], phash=previous['phash'])
+            return previous['screenshot']
+
+        content_hash = hashlib.sha256(png).hexdigest()
+        base_name = content_hash[:32]
+        filename = f"{base_name}.{self.screenshot_extension()}"
+        with self.stats_lock:
+            # 同一内容正在被其他线程写入或已经写入过
+            claimed = content_hash in self.screenshot_hashes
+            self.screenshot_hashes.setdefault(content_hash, filename)
+        if claimed or os.path.exists(os.path.join(self.config['screenshots_dir'], filename)):
+            logging.info(f"截图与已保存的 {filename} 完全相同，直接复用")
+            self.metrics.inc('screenshot_duplicates')
+        else:
+            args = (png, self.config['screenshots_dir'], base_name,
+                    self.config['screenshot_formats'], self.config['screenshot_quality'],
+                    self.config['screenshot_thumbnails'])
+            try:
+                with self.metrics.timer('screenshot_encode'):
+                    if self.image_pool:
+                        filenames = self.image_pool.submit(encode_screenshot, *args).result()
+                    else:
+                        filenames = encode_screenshot(*args)
+            except Exception as e:
+                logging.error(f"保存截图失败 {tool_name}: {str(e)}")
+                with self.stats_lock:
+                    self.screenshot_hashes.pop(content_hash, None)
+                return None
+            self.metrics.inc('screenshot_bytes_written', sum(
+                os.path.getsize(os.path.join(self.config['screenshots_dir'], f)) for f in filenames))
+            logging.info(f"成功保存截图 {tool_name}: {', '.join(filenames)}")
+
+        if self.cache and cache_key:
+            self.cache.put(cache_key, 'screenshot', screenshot=filename, content_hash=content_hash, phash=phash)
+        return filename
+
+    def screenshot_extension(self):
+        """主格式截图的文件扩展名"""
+        fmt = self.config['screenshot_formats'][0].lower()
+        return 'jpg' if fmt == 'jpeg' else fmt
+
+    def record_screenshot_change(self, cache_key, change):
+        """记录网站截图的视觉变化分数（0~1，None 表示第一次截图），写入记录的 screenshot_change 字段"""
+        if not cache_key:
+            return
+        with self.stats_lock:
+            self.screenshot_changes[website_site_key(cache_key)] = change
+
+    def screenshot_change_for(self, url):
+        with self.stats_lock:
+            return self.screenshot_changes.get(website_site_key(url))
+
+    def save_debug_screenshot(self, filename):
+        """保存调试截图；与本次运行中已保存的调试截图完全相同时不再重复写入"""
+        try:
+            png = self.driver.get_screenshot_as_png()
+        except Exception as e:
+            logging.debug(f"保存调试截图 {filename} 失败: {str(e)}")
+            return
+        digest = hashlib.sha256(png).hexdigest()
+        existing = self.debug_screenshots.get(digest)
+        if existing:
+            logging.info(f"调试截图 {filename} 与 {existing} 相同，不再保存")
+            return
+        with open(filename, 'wb') as f:
+            f.write(png)
+        self.debug_screenshots[digest] = filename
+
+    def parse_product_card(self, card):
+        """
+        从列表页卡片中解析基础字段（不访问详情页）
+
+        Returns:
+            dict: 卡片信息，缺少名称或链接时返回None
+        """
+        # 提取产品名称和链接
+        name_elem = card.find('div', {'data-test': 'product-item-name'})
+        link_elem = card.find('a', href=True)
+
+        # 获取缩略图
+        thumbnail_elem = card.find('img', {'loading': 'lazy'})
+
+        # 获取标签
+        tags = []
+        tag_links = card.find_all('a', {'class': 'text-12'})
+        for tag_link in tag_links:
+            tag_text = tag_link.get_text(strip=True)
+            if tag_text:
+                tags.append(tag_text)
+
+        # 获取关注者数量
+        followers_elem = card.find('div', {'class': 'styles_followersCount__Auv5S'})
+
+        return self.build_card_info({
+            'nameText': name_elem.get_text(strip=True) if name_elem else None,
+            'href': link_elem.get('href', '') if link_elem else None,
+            'thumbnail': thumbnail_elem.get('src') if thumbnail_elem else '',
+            'tags': tags,
+            'followersText': followers_elem.get_text(strip=True) if followers_elem else '0'
+        })
+
+    def parse_product_node(self, node):
+        """从 selectolax 节点中解析卡片字段，与 parse_product_card 等价"""
+        name_elem = node.css_first('div[data-test="product-item-name"]')
+        link_elem = node.css_first('a[href]')
+        thumbnail_elem = node.css_first('img[loading="lazy"]')
+        followers_elem = node.css_first('div.styles_followersCount__Auv5S')
+        return self.build_card_info({
+            'nameText': name_elem.text(strip=True) if name_elem else None,
+            'href': link_elem.attributes.get('href') if link_elem else None,
+            'thumbnail': (thumbnail_elem.attributes.get('src') or '') if thumbnail_elem else '',
+            'tags': [t for t in (a.text(strip=True) for a in node.css('a.text-12')) if t],
+            'followersText': followers_elem.text(strip=True) if followers_elem else '0'
+        })
+
+    def build_card_info(self, fields):
+        """
+        由卡片原始字段构建卡片信息，HTML解析和浏览器内提取共用
+
+        Args:
+            fields: 包含 nameText、href、thumbnail、tags、followersText 的字典
+
+        Returns:
+            dict: 卡片信息，缺少名称或链接时返回None
+        """
+        if not fields.get('nameText'):
+            logging.warning("未找到产品名称元素，跳过该卡片")
+            return None
+
+        # 提取产品名称（去掉描述部分）
+        name_text = fields['nameText']
+        name = name_text.split('—')[0].strip()
+        description = name_text.split('—')[1].strip() if len(name_text.split('—')) > 1 else ''
+
+        if not fields.get('href'):
+            logging.warning(f"跳过产品 {name}：未找到产品链接")
+            return None
+        product_base_url = urljoin(self.config['base_url'], fields['href'])
+        # 确保URL指向产品主页而不是shoutouts页面
+        product_url = product_base_url.split('/shoutouts')[0]
+
+        followers = int(''.join(filter(str.isdigit, fields.get('followersText') or '0')) or 0)
+
+        return {
+            'name': name,
+            'description': description,
+            'product_url': product_url,
+            'thumbnail': fields.get('thumbnail') or '',
+            'followers': followers,
+            'tags': fields.get('tags') or []
+        }
+
+    def parse_listing_html(self, html, backend=None):
+        """
+        解析离线保存的列表页HTML
+
+        Args:
+            html: 页面源码
+            backend: html.parser、lxml 或 selectolax，默认取 listing_parser 配置
+
+        Returns:
+            list: 卡片信息
+        """
+        backend = backend or self.config['listing_parser']
+        if backend == 'selectolax':
+            if SelectolaxParser is None:
+                logging.warning("未安装 selectolax，改用 html.parser")
+                backend = 'html.parser'
+            else:
+                tree = SelectolaxParser(html)
+                nodes = tree.css(f'div{PRODUCT_CARD_SELECTOR}')
+                return [c for c in (self.parse_product_node(n) for n in nodes) if c]
+
+        try:
+            soup = BeautifulSoup(html, backend)
+        except FeatureNotFound:
+            logging.warning(f"解析器 {backend} 不可用，改用 html.parser")
+            soup = BeautifulSoup(html, 'html.parser')
+        product_cards = soup.find_all('div', {'data-sentry-component': 'ProductItem'})
+        return [c for c in (self.parse_product_card(card) for card in product_cards) if c]
+
+    def extract_new_cards(self, driver, release=False):
+        """在浏览器中一次性提取尚未返回过的卡片字段；release 为True时同时清空这些卡片的DOM子树"""
+        try:
+            with self.metrics.timer('extraction'):
+                raw_cards = driver.execute_script(CARD_EXTRACT_SCRIPT, PRODUCT_CARD_SELECTOR, release)
+        except Exception as e:
+            logging.warning(f"提取卡片数据失败: {str(e)}")
+            return []
+        return [c for c in (self.build_card_info(fields) for fields in raw_cards) if c]
+
+    def process_product(self, card_info, original_url, driver=None):
+        """
+        处理单个产品：解析真实URL并截图
+
+        Args:
+            card_info: parse_product_card 返回的卡片信息
+            original_url: 列表页URL
+            driver: 使用的浏览器实例，默认为 self.driver
+
+        Returns:
+            dict: 产品数据，无法获取真实URL时返回None
+        """
+        resumed = self.resumed_records.get(normalize_product_url(card_info['product_url']))
+        if resumed:
+            logging.info(f"产品已在上次运行中写入，跳过: {card_info['name']}")
+            card_info['resumed'] = True
+            return resumed
+
+        if card_info.get('previous'):
+            logging.info(f"产品未变化，复用历史数据: {card_info['name']}")
+            return {**card_info['previous'], 'product_url': card_info['product_url'], 'screenshot_change': 0.0}
+
+        name = card_info['name']
+        product_url = card_info['product_url']
+
+        cached = self.cache.get(product_url, 'url') if self.cache else None
+        if cached and cached['clean_url'] and not is_redirect_link(cached['clean_url']):
+            logging.info(f"缓存命中规范网站地址: {cached['clean_url']}")
+            self.metrics.inc('cache_hits_url')
+            clean_url = cached['clean_url']
+        else:
+            # 获取真实URL
+            with self.metrics.timer('resolve_url'):
+                real_url = self.get_real_url(product_url, original_url, driver=driver)
+            if not real_url:
+                logging.warning(f"跳过产品 {name}：无法获取真实URL")
+                return None
+
+            # 跟随跳转并读取 canonical，只去掉跟踪参数
+            clean_url = self.resolve_canonical_url(real_url)
+            if self.cache:
+                self.cache.put(product_url, 'url', real_url=real_url, clean_url=clean_url)
+
+        # 获取网站截图（同一网站只截一次）；启用流水线时只提交任务，记录中先放 Future
+        screenshot_filename = self.screenshot_for_site(clean_url, name, driver=driver)
+
+        return {
+            'name': name,
+            'url': clean_url,
+            'product_url': product_url,
+            'description': card_info['description'],
+            'thumbnail': card_info['thumbnail'],
+            'followers': card_info['followers'],
+            'tags': card_info['tags'],
+            'topics': card_info.get('topics', []),
+            'category': card_info.get('category', 'AI'),
+            'source': card_info.get('source', 'ProductHunt'),
+            'screenshot': screenshot_filename,
+            # 启用截图流水线时在截图完成后由 resolve_screenshot 填入
+            'screenshot_change': (None if isinstance(screenshot_filename, Future)
+                                  else self.screenshot_change_for(clean_url)),
+            'crawled_at': datetime.now().isoformat()
+        }
+
+    def process_products_parallel(self, scheduler, results):
+        """
+        使用多个浏览器实例并发处理详情页和截图，结果按列表顺序写入 results
 
-        # 添加新的配置项
-        chrome_options.add_argument('--disable-web-security')
-        chrome_options.add_argument('--ignore-certificate-errors')
-        chrome_options.add_argument('--allow-running-insecure-content')
-        chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
-        
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.set_page_load_timeout(self.config['page_load_timeout'])
-        self.driver.set_script_timeout(self.config['page_load_timeout'])
+        列表页只解析一次，每个工作线程独占一个浏览器实例（WebDriver 会话不是线程安全的），
+        各线程从调度队列中按优先级取产品。浏览器由管理器持有，常驻模式下跨任务保持预热。
+        """
+        worker_count = min(self.config['workers'], len(scheduler))
+        if worker_count == 0:
+            return
 
-    def scroll_page(self):
-        """通过滚动加载更多内容"""
-        SCROLL_PAUSE_TIME = 2
-        max_attempts = self.config['scroll_count']
-        attempts = 0
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
+        sessions = self.browser.group('worker', worker_count)
+        logging.info(f"使用 {worker_count} 个浏览器实例并发处理 {len(scheduler)} 个产品")
 
-        while attempts < max_attempts:
+        def worker(session):
+            while True:
+                item = scheduler.pop()
+                if item is None:
+                    return
+                index, card_info = item
+                tool_data = None
+                try:
+                    with self.metrics.timer('product_total'):
+                        tool_data = self.process_product(card_info, card_info['listing_url'], driver=session.driver)
+                    results[index] = tool_data
+                except Exception as e:
+                    logging.error(f"处理产品 {card_info['name']} 时出错: {str(e)}", exc_info=True)
+                finally:
+                    self.metrics.inc('products_processed' if tool_data else 'products_failed')
+                    self.emit_record(index, card_info, tool_data)
+                    self.browser.check(session)
+
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            for future in [executor.submit(worker, session) for session in sessions]:
+                future.result()
+
+    def crawl(self):
+        """按配置的来源和话题收集产品，去重后按优先级处理详情页和截图"""
+        scheduler = self.collect_listings()
+
+        if self.config['incremental']:
+            self.plan_incremental(scheduler.cards)
+
+        results = [None] * len(scheduler)
+        if self.config['workers'] > 1:
+            self.process_products_parallel(scheduler, results)
+        else:
+            self.process_products_serial(scheduler, results)
+
+        # 按列表顺序合并结果
+        for tool_data in results:
+            if tool_data:
+                self.tools_data.append(tool_data)
+
+    def collect_listings(self):
+        """
+        列表页阶段：按配置的来源和话题收集产品卡片
+
+        Returns:
+            CrawlScheduler: 去重后的产品调度队列
+        """
+        scheduler = CrawlScheduler(by_followers=self.config['priority_by_followers'])
+        collected = 0
+        for source, topics in self.config['sources'].items():
+            collect = self.sources[source]
+            for topic, category in topics.items():
+                try:
+                    card_infos = collect(topic, category)
+                except Exception as e:
+                    logging.error(f"收集 {source}/{topic} 失败，跳过该话题: {str(e)}")
+                    continue
+                collected += 1
+                added = sum(1 for card_info in card_infos if scheduler.push(card_info))
+                logging.info(f"{source}/{topic}: 找到 {len(card_infos)} 个产品，其中新产品 {added} 个")
+
+        if not collected:
+            # 全部失败时不继续，避免用空结果覆盖输出文件
+            raise Exception("所有话题的列表页均收集失败")
+        return scheduler
+
+    def process_products_serial(self, scheduler, results):
+        """在主浏览器中按优先级逐个处理产品"""
+        while True:
+            item = scheduler.pop()
+            if item is None:
+                break
+            index, card_info = item
+            url = card_info['listing_url']
             try:
-                # 滚动到页面底部
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(SCROLL_PAUSE_TIME)  # 等待页面加载
+                with self.metrics.timer('product_total'):
+                    tool_data = self.process_product(card_info, url)
+                self.emit_record(index, card_info, tool_data)
+                # 详情页和截图都在工作标签页中进行，列表页不受影响，只需检查浏览器是否崩溃或内存过高
+                self.browser.check(self.main_session)
+                if not tool_data:
+                    self.metrics.inc('products_failed')
+                    continue
+                self.metrics.inc('products_processed')
+
+                results[index] = tool_data
+                logging.info(f"成功处理产品: {tool_data['name']}, 标签: {tool_data['tags']}")
 
-                # 计算新的滚动高度并与上一次的滚动高度进行比较
-                new_height = self.driver.execute_script("return document.body.scrollHeight")
-                
-                # 获取当前加载的卡片数量
-                cards = self.driver.find_elements(By.CSS_SELECTOR, '[data-sentry-component="MostLovedCardDesktop"]')
-                logging.info(f"已加载 {len(cards)} 个产品")
-                
-                # 如果高度没有变化，说明已经到底部
-                if new_height == last_height:
-                    logging.info("已到达页面底部")
-                    break
-                    
-                last_height = new_height
-                attempts += 1
-                
             except Exception as e:
-                logging.warning(f"滚动加载更多内容时出错: {str(e)}")
-                break
-        
-        logging.info(f"完成滚动加载操作，共滚动 {attempts} 次")
+                kind = classify_error(e)
+                logging.error(f"处理产品卡片时出错（{kind}）: {str(e)}", exc_info=True)
+                self.metrics.inc('products_failed')
+                self.metrics.inc(f'errors_{kind}')
+                self.emit_record(index, card_info, None)
+                # 列表已经解析完毕，不再重新加载列表页，跳过该产品继续；浏览器崩溃时重启
+                self.browser.check(self.main_session)
 
-    def get_real_url(self, product_url, original_url):
-        """通过产品详情页获取真实URL，并确保能够返回原始页面"""
-        try:
-            logging.info(f"访问产品详情页: {product_url}")
-            
-            # 保存当前窗口句柄
-            original_window = self.driver.current_window_handle
-            
-            # 创建新标签页
-            self.driver.execute_script("window.open('');")
-            self.driver.switch_to.window(self.driver.window_handles[-1])
-            
+    def crawl_bounded(self):
+        """
+        有界内存模式：边滚动边处理，内存占用不随话题中的产品数量增长
+
+        每批新卡片提取后立即清空其DOM子树，卡片经有界队列交给处理线程，队列满时滚动暂停；
+        记录写入NDJSON后不再保留，最终JSON由 compact_stream 流式生成。
+        跨话题重复的产品只处理第一次出现，不合并话题，也不做全局的关注者排序。
+        """
+        seen = set()
+        positions = itertools.count()
+        worker_count = self.config['workers']
+        cards = queue.Queue(maxsize=self.config['card_queue_size'])
+
+        def handle(item, session):
+            index, card_info = item
+            tool_data = None
             try:
-                # 在新标签页中加载产品详情页
-                self.driver.get(product_url)
-                wait = WebDriverWait(self.driver, self.config['timeout'])
-                
-                # 尝试多个可能的选择器来定位 Visit Website 按钮
-                website_link = None
-                selectors = [
-                    "//a[contains(text(), 'Visit website')]",
-                    "//a[contains(@class, 'styles_websiteButton')]",
-                    "//a[contains(@data-test, 'website-link')]",
-                    "//a[contains(@class, 'styles_button') and contains(@class, 'styles_website')]"
-                ]
-                
-                real_url = None
-                for selector in selectors:
-                    try:
-                        website_link = wait.until(
-                            EC.presence_of_element_located((By.XPATH, selector))
-                        )
-                        if website_link:
-                            real_url = website_link.get_attribute('href')
-                            if real_url:
-                                logging.info(f"成功获取真实URL: {real_url}")
-                                break
-                    except Exception as e:
-                        logging.debug(f"使用选择器 {selector} 查找失败: {str(e)}")
-                        continue
-                
-                return real_url
-                
+                with self.metrics.timer('product_total'):
+                    tool_data = self.process_product(card_info, card_info['listing_url'], driver=session.driver)
+            except Exception as e:
+                logging.error(f"处理产品 {card_info['name']} 时出错: {str(e)}", exc_info=True)
             finally:
-                # 关闭当前标签页并切回原始标签页
-                self.driver.close()
-                self.driver.switch_to.window(original_window)
-                
-        except Exception as e:
-            logging.error(f"获取真实URL时出错: {str(e)}")
-            # 确保返回原始窗口
-            try:
-                self.driver.switch_to.window(original_window)
-            except:
-                pass
-            return None
+                self.metrics.inc('products_processed' if tool_data else 'products_failed')
+                self.emit_record(index, card_info, tool_data)
+                self.browser.check(session)
 
-    def clear_browser_data(self):
-        """清理浏览器数据"""
+        def consume(session):
+            while True:
+                item = cards.get()
+                if item is None:
+                    return
+                handle(item, session)
+
+        def on_card(card_info):
+            key = normalize_product_url(card_info['product_url'])
+            if key in seen:
+                return
+            seen.add(key)
+            item = (next(positions), card_info)
+            if worker_count > 1:
+                # 队列满时阻塞，滚动随之暂停
+                with self.metrics.timer('backpressure_wait'):
+                    cards.put(item)
+            else:
+                # 单浏览器时在工作标签页中直接处理，处理完切回列表页继续滚动
+                generation = self.main_session.generation
+                handle(item, self.main_session)
+                if self.main_session.generation != generation:
+                    raise CrawlError('driver_crash', "处理产品时浏览器已重启，列表页丢失")
+                self.browser.main_tab(self.driver)
+
+        executor = None
+        if worker_count > 1:
+            sessions = self.browser.group('worker', worker_count)
+            executor = ThreadPoolExecutor(max_workers=worker_count)
+            consumers = [executor.submit(consume, session) for session in sessions]
+
+        collected = 0
         try:
-            # 只清理 cookies
-            self.driver.delete_all_cookies()
-            logging.info("已清理cookies")
-            
-            # 只在正常页面（非data: URL）时清理存储
-            current_url = self.driver.current_url
-            if not current_url.startswith('data:'):
-                try:
-                    self.driver.execute_script("window.localStorage.clear();")
-                    self.driver.execute_script("window.sessionStorage.clear();")
-                    logging.info("已清理localStorage和sessionStorage")
-                except Exception as storage_error:
-                    logging.debug(f"清理存储时出错（非致命）: {str(storage_error)}")
-            
-        except Exception as e:
-            logging.warning(f"清理浏览器数据时出错: {str(e)}")
-            # 继续执行，不中断程序
+            for source, topics in self.config['sources'].items():
+                collect = self.sources[source]
+                for topic, category in topics.items():
+                    for attempt in range(self.config['max_retries']):
+                        try:
+                            collect(topic, category, on_card=on_card)
+                        except Exception as e:
+                            if classify_error(e) == 'driver_crash' and attempt < self.config['max_retries'] - 1:
+                                # 重新打开列表页继续滚动，已处理过的产品按 seen 跳过
+                                logging.warning(f"{source}/{topic} 列表页所在浏览器已重启，重新打开继续收集")
+                                continue
+                            logging.error(f"收集 {source}/{topic} 失败，跳过该话题: {str(e)}")
+                            break
+                        collected += 1
+                        break
+        finally:
+            if executor:
+                for _ in range(worker_count):
+                    cards.put(None)
+                for consumer in consumers:
+                    consumer.result()
+                executor.shutdown()
+
+        logging.info(f"有界内存模式共处理 {len(seen)} 个产品")
+        if not collected:
+            raise Exception("所有话题的列表页均收集失败")
 
-    def take_website_screenshot(self, url, tool_name):
+    def crawl_producthunt(self, topic='artificial-intelligence', category='AI', on_card=None):
         """
-        访问网站并保存截图
-        
+        爬取ProductHunt话题列表页，返回解析出的产品卡片（不访问详情页）
+
         Args:
-            url: 网站URL
-            tool_name: 工具名称（用于生成文件名）
-        
+            topic: 话题标识，如 artificial-intelligence
+            category: 写入记录的分类
+            on_card: 有界内存模式的回调，卡片在滚动过程中逐个交给它，不再汇总返回
+
         Returns:
-            str: 截图文件路径，如果失败则返回None
+            list: parse_product_card 返回的卡片信息；有 on_card 时为空列表
         """
-        try:
-            # 保存当前窗口句柄
-            original_window = self.driver.current_window_handle
-            
-            # 创建新标签页
-            self.driver.execute_script("window.open('');")
-            self.driver.switch_to.window(self.driver.window_handles[-1])
-            
-            try:
-                # 设置窗口大小
-                self.driver.set_window_size(1920, 1080)
-                
-                # 访问网站
-                self.driver.get(url)
-                
-                # 等待页面加载
-                wait = WebDriverWait(self.driver, self.config['timeout'])
-                wait.until(lambda driver: driver.execute_script("return document.readyState") == "complete")
-                
-                # 额外等待以确保动态内容加载
-                time.sleep(3)
-                
-                # 生成文件名（使用时间戳避免重名）
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                safe_name = re.sub(r'[^\w\-_]', '_', tool_name)
-                filename = f"{safe_name}_{timestamp}.png"
-                filepath = os.path.join(self.config['screenshots_dir'], filename)
-                
-                # 保存截图
-                self.driver.save_screenshot(filepath)
-                
-                # 使用Pillow优化图片
-                with Image.open(filepath) as img:
-                    # 压缩图片
-                    img.save(filepath, 'PNG', optimize=True, quality=85)
-                
-                logging.info(f"成功保存截图: {filepath}")
-                return filename
-                
-            finally:
-                # 关闭新标签页并返回原始标签页
-                self.driver.close()
-                self.driver.switch_to.window(original_window)
-                
-        except Exception as e:
-            logging.error(f"截图失败 {url}: {str(e)}")
-            return None
-
-    def crawl_producthunt(self):
-        """爬取ProductHunt上的AI工具"""
-        url = "https://www.producthunt.com/topics/artificial-intelligence"
+        url = f"{self.config['base_url']}/topics/{topic}"
         try:
             logging.info(f"开始访问URL: {url}")
             
-            # 改进的重试机制
+            # 按错误类型重试：暂时性错误指数退避，浏览器崩溃重启后立即重试，其余直接失败
             for attempt in range(self.config['max_retries']):
+                started = time.time()
+                if not self.breaker.allow(url):
+                    raise CrawlError('bot_block', f"{self.breaker.host_of(url)} 已熔断，跳过列表页")
                 try:
-                    # 先访问主页
-                    self.driver.get("https://www.producthunt.com")
-                    time.sleep(2)
-                    
-                    # 清理浏览器数据（在加载正常页面后）
-                    self.clear_browser_data()
+                    self.browser.main_tab(self.driver)
+                    self.apply_resource_profile(self.driver, 'listing')
+                    if not self.main_session.warmed:
+                        # 浏览器首次使用时先访问主页，之后的话题和重试直接访问目标页面
+                        self.driver.get(self.config['base_url'])
+                        self.wait_for_page_ready(self.driver, 'homepage', 2)
+
+                        # 清理浏览器数据（在加载正常页面后）
+                        self.clear_browser_data()
+                        self.main_session.warmed = True
                     
                     # 然后访问目标页面
-                    self.driver.get(url)
+                    with self.metrics.timer('navigation_listing'):
+                        self.driver.get(url)
+                    self.check_bot_block(self.driver)
                     
                     # 等待页面加载完成
                     wait = WebDriverWait(self.driver, self.config['timeout'])
                     wait.until(lambda driver: driver.execute_script("return document.readyState") == "complete")
                     
                     # 等待并点击 Top Products 按钮
-                    top_products_selectors = [
-                        "//button[contains(text(), 'Top Products')]",
-                        "//button[contains(@class, 'styles_inactiveTab') and contains(text(), 'Top Products')]",
-                        "//div[contains(@class, 'flex-row')]//button[contains(text(), 'Top Products')]"
-                    ]
+                    with self.metrics.timer('selector_wait'):
+                        button, selector = self.selectors.find(
+                            self.driver, 'top_products', TOP_PRODUCTS_SELECTORS, self.config['timeout'],
+                            clickable=True)
+                    if not button:
+                        raise CrawlError('missing_selector', "未能找到或点击Top Products按钮")
+                    if selector != TOP_PRODUCTS_SELECTORS[0]:
+                        self.metrics.inc('selector_fallbacks')
+
+                    # 截图记录点击前状态
+                    self.save_debug_screenshot(f"before_click_{attempt}.png")
                     
-                    button_clicked = False
-                    for selector in top_products_selectors:
-                        try:
-                            button = wait.until(
-                                EC.element_to_be_clickable((By.XPATH, selector))
-                            )
-                            # 截图记录点击前状态
-                            self.driver.save_screenshot(f"before_click_{attempt}.png")
-                            
-                            # 使用JavaScript点击按钮
-                            self.driver.execute_script("arguments[0].click();", button)
-                            logging.info(f"成功点击Top Products按钮，使用选择器: {selector}")
-                            button_clicked = True
-                            
-                            # 等待页面更新
-                            time.sleep(3)
-                            break
-                        except Exception as click_error:
-                            logging.debug(f"使用选择器 {selector} 点击失败: {str(click_error)}")
-                            continue
+                    # 使用JavaScript点击按钮
+                    self.driver.execute_script("arguments[0].click();", button)
+                    logging.info(f"成功点击Top Products按钮，使用选择器: {selector}")
                     
-                    if not button_clicked:
-                        raise Exception("未能找到或点击Top Products按钮")
+                    # 等待页面更新
+                    self.wait_for_page_ready(self.driver, 'tab_switch', 3,
+                                             card_selector=PRODUCT_CARD_SELECTOR)
                     
                     # 保存点击后的截图
-                    self.driver.save_screenshot(f"after_click_{attempt}.png")
+                    self.save_debug_screenshot(f"after_click_{attempt}.png")
                     
                     # 验证页面内容更新
                     wait.until(lambda driver: len(driver.find_elements(By.CSS_SELECTOR, '[data-sentry-component="ProductItem"]')) > 0)
                     
                     logging.info("页面加载和切换成功")
+                    self.breaker.record_success(url)
                     break
                     
                 except Exception as e:
-                    logging.warning(f"第 {attempt + 1} 次加载失败: {str(e)}")
+                    kind = classify_error(e)
+                    logging.warning(f"第 {attempt + 1} 次加载失败（{kind}）: {str(e)}")
+                    self.metrics.inc(f'errors_{kind}')
+                    if kind in TRANSIENT_ERRORS:
+                        self.breaker.record_failure(url)
+                    if kind not in TRANSIENT_ERRORS and kind != 'driver_crash':
+                        raise Exception(f"列表页加载失败（{kind}），不再重试: {str(e)}")
                     if attempt == self.config['max_retries'] - 1:
                         raise Exception(f"在 {self.config['max_retries']} 次尝试后仍无法加载页面")
-                    
+                    self.metrics.inc('listing_retries')
+
                     # 诊断信息
                     try:
                         logging.info(f"当前页面标题: {self.driver.title}")
                         logging.info(f"当前URL: {self.driver.current_url}")
                         logging.info(f"页面源码长度: {len(self.driver.page_source)}")
-                        self.driver.save_screenshot(f"error_screenshot_{attempt}.png")
+                        self.save_debug_screenshot(f"error_screenshot_{attempt}.png")
                         
                         # 保存页面源码以便分析
                         with open(f'page_source_{attempt}.html', 'w', encoding='utf-8') as f:
                             f.write(self.driver.page_source)
                     except Exception as debug_error:
                         logging.error(f"保存调试信息时出错: {str(debug_error)}")
-                    
-                    time.sleep(self.config['retry_delay'] * (attempt + 1))
+
+                    # 浏览器崩溃时重启，重启后的新实例会重新访问主页
+                    self.retry_wait(kind, attempt, started, self.main_session)
+                    self.wait_for_host(url)
             
-            # 保存页面源码以便调试
-            with open('page_source.html', 'w', encoding='utf-8') as f:
-                f.write(self.driver.page_source)
+            # 有界内存模式必须在浏览器内增量提取，也不保存整页源码
+            dom_mode = self.config['extraction_mode'] == 'dom' or on_card is not None
+            if not dom_mode:
+                # 保存页面源码以便调试
+                with open('page_source.html', 'w', encoding='utf-8') as f:
+                    f.write(self.driver.page_source)
             
             # 截图保存当前页面状态
-            self.driver.save_screenshot("initial_page_load.png")
+            self.save_debug_screenshot("initial_page_load.png")
             
             logging.info("主页面加载成功，准备处理内容")
             
-            # 开始滚动加载更多内容
-            self.scroll_page()
+            listing_fields = {'category': category, 'source': 'ProductHunt', 'listing_url': url}
 
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            product_cards = soup.find_all('div', {'data-sentry-component': 'ProductItem'})
-            logging.info(f"滚动加载后总共找到 {len(product_cards)} 个产品卡片")
+            def on_cards(batch):
+                for card_info in batch:
+                    card_info.update(listing_fields, topics=[topic])
+                    on_card(card_info)
 
-            for card in product_cards:
-                try:
-                    # 增加显式等待
-                    wait = WebDriverWait(self.driver, self.config['timeout'])
-                    
-                    # 提取产品名称和链接
-                    name_elem = card.find('div', {'data-test': 'product-item-name'})
-                    if not name_elem:
-                        logging.warning("未找到产品名称元素，跳过该卡片")
-                        continue
-
-                    # 提取产品名称（去掉描述部分）
-                    name_text = name_elem.get_text(strip=True)
-                    name = name_text.split('—')[0].strip()
-                    description = name_text.split('—')[1].strip() if len(name_text.split('—')) > 1 else ''
-                    
-                    # 获取产品链接并访问产品详情页
-                    link_elem = card.find('a', href=True)
-                    if link_elem:
-                        product_base_url = urljoin("https://www.producthunt.com", link_elem.get('href', ''))
-                        # 确保URL指向产品主页而不是shoutouts页面
-                        product_url = product_base_url.split('/shoutouts')[0]
-                        
-                        # 获取真实URL
-                        real_url = self.get_real_url(product_url, url)
-                        if not real_url:
-                            logging.warning(f"跳过产品 {name}：无法获取真实URL")
-                            continue
-
-                        # 清理URL
-                        parsed_url = urlparse(real_url)
-                        clean_url = urlunparse((
-                            parsed_url.scheme,
-                            parsed_url.netloc,
-                            parsed_url.path,
-                            '',
-                            '',
-                            ''
-                        ))
-                    
-                    # 获取缩略图
-                    thumbnail_elem = card.find('img', {'loading': 'lazy'})
-                    thumbnail = thumbnail_elem.get('src') if thumbnail_elem else ''
-                    
-                    # 获取标签
-                    tags = []
-                    tag_links = card.find_all('a', {'class': 'text-12'})
-                    for tag_link in tag_links:
-                        tag_text = tag_link.get_text(strip=True)
-                        if tag_text:
-                            tags.append(tag_text)
-                    
-                    # 获取关注者数量
-                    followers_elem = card.find('div', {'class': 'styles_followersCount__Auv5S'})
-                    followers_text = followers_elem.get_text(strip=True) if followers_elem else '0'
-                    followers = int(''.join(filter(str.isdigit, followers_text)))
+            # 开始滚动加载更多内容；dom 模式在滚动过程中增量提取卡片
+            with self.metrics.timer('listing_scroll'):
+                card_infos = self.scroll_page(extract=dom_mode, on_cards=on_cards if on_card else None)
+            self.record_resource_usage(self.driver, 'listing')
 
-                    # 获取网站截图
-                    screenshot_filename = self.take_website_screenshot(clean_url, name)
-                    
-                    tool_data = {
-                        'name': name,
-                        'url': clean_url,
-                        'description': description,
-                        'thumbnail': thumbnail,
-                        'followers': followers,
-                        'tags': tags,
-                        'category': 'AI',
-                        'source': 'ProductHunt',
-                        'screenshot': screenshot_filename,
-                        'crawled_at': datetime.now().isoformat()
-                    }
-
-                    self.tools_data.append(tool_data)
-                    logging.info(f"成功处理产品: {name}, 标签: {tags}")
-
-                    # 确保主页面正常显示
-                    retry_count = 0
-                    while retry_count < self.config['max_retries']:
-                        try:
-                            # 检查页面是否仍然可用
-                            self.driver.find_element(By.CSS_SELECTOR, '[data-sentry-component="ProductItem"]')
-                            break
-                        except Exception as e:
-                            retry_count += 1
-                            if retry_count == self.config['max_retries']:
-                                logging.error("主页面状态异常，尝试重新加载")
-                                self.driver.get(url)
-                                wait.until(EC.presence_of_element_located(
-                                    (By.CSS_SELECTOR, '[data-sentry-component="ProductItem"]')
-                                ))
-                            time.sleep(self.config['retry_delay'])
-
-                    # 随机化等待时间
-                    wait_time = self.config['min_request_interval'] + random.uniform(1, 3)
-                    time.sleep(wait_time)
+            if not dom_mode:
+                with self.metrics.timer('extraction'):
+                    card_infos = self.parse_listing_html(self.driver.page_source)
+            logging.info(f"滚动加载后总共找到 {len(card_infos)} 个产品卡片")
 
-                except Exception as e:
-                    logging.error(f"处理产品卡片时出错: {str(e)}", exc_info=True)
-                    # 尝试恢复到主页面
-                    try:
-                        self.driver.get(url)
-                        time.sleep(self.config['retry_delay'])
-                    except:
-                        logging.error("无法恢复到主页面，退出循环")
-                        break
+            for card_info in card_infos:
+                # 每张卡片独立的话题列表，合并重复产品时不会影响同话题的其他卡片
+                card_info.update(listing_fields, topics=[topic])
+            return card_infos
 
         except Exception as e:
             logging.error(f"爬取ProductHunt时出错: {str(e)}\n错误类型: {type(e).__name__}\n错误详情: {e.__dict__}")
+            self.breaker.release(url)
             # 保存错误时的页面源码和截图
             try:
                 with open('error_page_source.html', 'w', encoding='utf-8') as f:
                     f.write(self.driver.page_source)
-                self.driver.save_screenshot("error_page.png")
+                self.save_debug_screenshot("error_page.png")
             except:
                 pass
             raise
 
+    def load_previous_data(self):
+        """读取上一次输出的数据集，按产品URL和名称建立索引"""
+        self.previous_index = {}
+        self.previous_data = []
+        if not os.path.exists(self.output_file):
+            logging.info(f"未找到历史数据 {self.output_file}，增量模式将处理全部产品")
+            return
+
+        try:
+            with open(self.output_file, 'r', encoding='utf-8') as f:
+                self.previous_data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取历史数据失败，增量模式将处理全部产品: {str(e)}")
+            return
+
+        for record in self.previous_data:
+            if record.get('product_url'):
+                self.previous_index[normalize_product_url(record['product_url'])] = record
+            if record.get('name'):
+                self.previous_index.setdefault(f"name:{record['name']}", record)
+        logging.info(f"已加载 {len(self.previous_data)} 条历史数据")
+
+    def match_previous(self, card_info):
+        """在历史数据中查找与卡片对应的记录"""
+        return (self.previous_index.get(normalize_product_url(card_info['product_url']))
+                or self.previous_index.get(f"name:{card_info['name']}"))
+
+    def plan_incremental(self, card_infos):
+        """
+        对比列表卡片与历史数据的廉价字段，标记新增、变更和未变更的产品
+
+        未变更的卡片会带上历史记录，process_product 直接复用，不再访问详情页和截图。
+        """
+        for card_info in card_infos:
+            previous = self.match_previous(card_info)
+            if not previous:
+                card_info['status'] = 'added'
+                continue
+
+            changes = {
+                field: [previous.get(field), card_info[field]]
+                for field in INCREMENTAL_FIELDS
+                if previous.get(field) != card_info[field]
+            }
+            if changes:
+                card_info['status'] = 'changed'
+                card_info['changes'] = changes
+            else:
+                card_info['status'] = 'unchanged'
+                card_info['previous'] = previous
+
+        counts = {status: sum(1 for c in card_infos if c['status'] == status)
+                  for status in ('added', 'changed', 'unchanged')}
+        logging.info(f"增量对比结果: 新增 {counts['added']}，变更 {counts['changed']}，未变更 {counts['unchanged']}")
+        self.incremental_plan = {c['product_url']: c for c in card_infos}
+
+    def merge_incremental(self):
+        """
+        合并本次结果与历史数据，并写出包含新增、变更和移除条目的差异文件
+
+        本次列表中出现但处理失败的产品沿用上次的记录，列入差异文件的 stale，不算移除。
+        """
+        delta = {'added': [], 'changed': [], 'removed': [], 'stale': []}
+        # 本次列表中出现过的历史记录（即使处理失败也不算移除）
+        seen = {id(self.match_previous(c)) for c in self.incremental_plan.values()}
+        processed = set()
+        for record in self.tools_data:
+            processed.add(record.get('product_url'))
+            card_info = self.incremental_plan.get(record.get('product_url'), {})
+            status = card_info.get('status')
+            if status == 'added':
+                delta['added'].append(record)
+            elif status == 'changed':
+                delta['changed'].append({**record, 'changes': card_info['changes']})
+
+        # 本次处理失败的历史产品
+        for product_url, card_info in self.incremental_plan.items():
+            previous = self.match_previous(card_info)
+            if product_url in processed or not previous:
+                continue
+            delta['stale'].append({**previous, 'status': card_info.get('status')})
+            self.tools_data.append(previous)
+            if self.stream:
+                self.stream.write(previous)
+
+        # 本次列表中未出现的历史产品
+        for record in self.previous_data:
+            if id(record) not in seen:
+                delta['removed'].append(record)
+                if self.config['incremental_keep_removed']:
+                    self.tools_data.append(record)
+                    if self.stream:
+                        self.stream.write(record)
+
+        try:
+            with open(self.config['delta_file'], 'w', encoding='utf-8') as f:
+                json.dump(delta, f, ensure_ascii=False, indent=2)
+            logging.info(f"已写入差异文件 {self.config['delta_file']}: 新增 {len(delta['added'])}，"
+                         f"变更 {len(delta['changed'])}，移除 {len(delta['removed'])}，"
+                         f"处理失败沿用旧记录 {len(delta['stale'])}")
+        except Exception as e:
+            logging.error(f"写入差异文件失败: {str(e)}")
+
+    def open_stream(self):
+        """打开NDJSON流式输出；断点续爬时加载已写入的记录"""
+        if not self.config['stream_file']:
+            return
+
+        if self.config['resume']:
+            for record in StreamWriter.read_records(self.config['stream_file']):
+                if record.get('product_url'):
+                    # 有界内存模式的最终JSON由NDJSON生成，只需记住哪些产品已写入
+                    self.resumed_records[normalize_product_url(record['product_url'])] = (
+                        True if self.config['bounded_memory'] else record)
+            if os.path.exists(self.config['checkpoint_file']):
+                with open(self.config['checkpoint_file'], 'r', encoding='utf-8') as f:
+                    checkpoint = json.load(f)
+                logging.info(f"读取断点: 上次已连续处理到第 {checkpoint['last_index'] + 1} 个卡片")
+            logging.info(f"断点续爬: 已有 {len(self.resumed_records)} 个产品写入 {self.config['stream_file']}")
+
+        self.stream = StreamWriter(self.config['stream_file'], self.config['checkpoint_file'],
+                                   resume=self.config['resume'])
+
+    def emit_record(self, index, card_info, tool_data):
+        """产品处理完成后立即追加到NDJSON并更新断点"""
+        if card_info.get('resumed'):
+            # 续爬复用的记录已经在文件中，只推进断点
+            if self.stream:
+                self.stream.write(None, index)
+            return
+        screenshot = tool_data.get('screenshot') if tool_data else None
+        if isinstance(screenshot, Future):
+            # 截图完成后再写出记录
+            screenshot.add_done_callback(
+                lambda future: self.emit_record(index, card_info, self.resolve_screenshot(tool_data, future)))
+            return
+        if not self.stream:
+            return
+        self.stream.write(tool_data, index)
+
+    def resolve_screenshot(self, tool_data, future):
+        """用截图任务的结果替换记录中的 Future"""
+        try:
+            tool_data['screenshot'] = future.result()
+            tool_data['screenshot_change'] = self.screenshot_change_for(tool_data['url'])
+        except Exception as e:
+            logging.error(f"截图任务失败 {tool_data['name']}: {str(e)}")
+            tool_data['screenshot'] = None
+        return tool_data
+
+    def start_screenshot_pipeline(self):
+        """按配置启动图片压缩进程池和独立截图流水线"""
+        if self.config['image_processes'] != 0:
+            self.image_pool = ProcessPoolExecutor(max_workers=self.config['image_processes'])
+        if self.config['screenshot_workers'] > 0:
+            self.screenshot_pipeline = ScreenshotPipeline(self, self.config['screenshot_workers'])
+
+    def stop_screenshot_pipeline(self):
+        """等待排队中的截图全部完成"""
+        if self.screenshot_pipeline:
+            self.screenshot_pipeline.close()
+            self.screenshot_pipeline = None
+        if self.image_pool:
+            self.image_pool.shutdown(wait=True)
+            self.image_pool = None
+
+    @staticmethod
+    def stream_record_key(record):
+        return normalize_product_url(record['product_url']) if record.get('product_url') else record.get('name')
+
+    def iter_compacted_records(self):
+        """
+        逐条返回NDJSON中每个产品最后一次写入的记录
+
+        读两遍文件：第一遍只记录每个产品最后一次出现的位置，第二遍逐条返回，不在内存中保留全部记录。
+        """
+        path = self.config['stream_file']
+        last_positions = {}
+        for position, record in enumerate(StreamWriter.read_records(path)):
+            last_positions[self.stream_record_key(record)] = position
+
+        for position, record in enumerate(StreamWriter.read_records(path)):
+            if last_positions[self.stream_record_key(record)] == position:
+                yield record
+
+    def compact_stream(self):
+        """将NDJSON流式压实为格式化的JSON数组（同一产品保留最后一次写入）"""
+        count = 0
+        tmp_path = f"{self.output_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('[')
+                for record in self.iter_compacted_records():
+                    # 与 json.dump(records, indent=2) 的输出完全一致
+                    f.write(',\n' if count else '\n')
+                    f.write(textwrap.indent(json.dumps(record, ensure_ascii=False, indent=2), '  '))
+                    count += 1
+                f.write('\n]' if count else ']')
+            os.replace(tmp_path, self.output_file)
+            self.saved_count = count
+            self.metrics.inc('output_bytes_written', os.path.getsize(self.output_file))
+            logging.info(f"Saved {count} tools to {self.output_file}")
+        except Exception as e:
+            logging.error(f"Error saving data: {str(e)}")
+
+    def export_data(self, records=None):
+        """
+        按 export_formats 把本次结果追加导出为列式/压缩/SQLite 格式
+
+        Args:
+            records: 无参函数，返回记录迭代器；默认使用内存中的 tools_data
+        """
+        if not self.config['export_formats']:
+            return
+        exporter = ResultExporter(
+            self.config['export_dir'], self.config['export_formats'],
+            run_id=datetime.fromtimestamp(self.metrics.started).strftime('%Y%m%dT%H%M%S'),
+            crawled_date=datetime.fromtimestamp(self.metrics.started).strftime('%Y-%m-%d')
+        )
+        with self.metrics.timer('export'):
+            exporter.export(records or (lambda: iter(self.tools_data)))
+
     def save_data(self):
         """保存数据到JSON文件"""
         try:
             with open(self.output_file, 'w', encoding='utf-8') as f:
                 json.dump(self.tools_data, f, ensure_ascii=False, indent=2)
+            self.saved_count = len(self.tools_data)
+            self.metrics.inc('output_bytes_written', os.path.getsize(self.output_file))
             logging.info(f"Saved {len(self.tools_data)} tools to {self.output_file}")
         except Exception as e:
             logging.error(f"Error saving data: {str(e)}")
 
-    def run(self):
-        """运行爬虫主程序"""
+    def run(self, keep_browser=False):
+        """
+        运行爬虫主程序
+
+        Args:
+            keep_browser: 为True时结束后保留浏览器和缓存（常驻模式下供下一个任务复用）
+        """
+        self.last_error = None
         try:
             logging.info("Starting crawler run")
 
+            bounded = self.config['bounded_memory']
+            if bounded and not self.config['stream_file']:
+                raise Exception("有界内存模式需要配置 stream_file")
+            if bounded and self.config['incremental']:
+                logging.warning("有界内存模式不支持增量爬取，本次按全量处理")
+                self.config['incremental'] = False
+
+            self.open_stream()
+            self.start_screenshot_pipeline()
+
+            if self.config['incremental']:
+                self.load_previous_data()
+
             # 爬取数据
-            self.crawl_producthunt()
+            if bounded:
+                self.crawl_bounded()
+            else:
+                self.crawl()
+            self.stop_screenshot_pipeline()
 
-            # 保存数据
-            self.save_data()
+            if self.config['incremental']:
+                self.merge_incremental()
+
+            # 保存数据；有界内存模式从NDJSON流式生成JSON
+            if bounded:
+                self.close_stream()
+                self.compact_stream()
+                self.export_data(self.iter_compacted_records)
+            else:
+                self.save_data()
+                self.export_data()
+
+            self.log_readiness_summary()
+            self.log_resource_summary()
 
             logging.info("Completed crawler run")
 
         except Exception as e:
             logging.error(f"Error in main crawler run: {str(e)}")
+            self.last_error = str(e)
+
+        finally:
+            self.stop_screenshot_pipeline()
+            self.selectors.save()
+            self.write_run_report()
+            if keep_browser:
+                self.close_stream()
+            else:
+                self.close()
+
+    def reset_run_state(self):
+        """清空上一个任务的结果和统计，浏览器、缓存和截图索引保留"""
+        self.tools_data = []
+        self.saved_count = 0
+        self.previous_data = []
+        self.previous_index = {}
+        self.incremental_plan = {}
+        self.resumed_records = {}
+        self.readiness_stats = {}
+        self.resource_stats = {}
+        self.site_screenshots = {}
+        self.screenshot_changes = {}
+        self.debug_screenshots = {}
+        self.metrics = CrawlMetrics()
+
+    def serve(self, address, authkey):
+        """
+        常驻模式：保持浏览器预热，通过 multiprocessing 连接接收爬取任务
+
+        任务是一个字典，可包含覆盖本次配置的 config，只接受 DAEMON_JOB_CONFIG_KEYS
+        中的键，输出和截图路径以常驻进程启动时的配置为准；收到 {'command': 'shutdown'} 时退出。
+        """
+        if not authkey:
+            raise ValueError("常驻模式必须指定连接密钥")
+        base_config = dict(self.config)
+        with Listener(address, authkey=authkey) as listener:
+            logging.info(f"常驻模式已启动，监听 {address}")
+            while True:
+                with listener.accept() as conn:
+                    try:
+                        job = conn.recv()
+                    except EOFError:
+                        continue
+                    if not isinstance(job, dict) or not isinstance(job.get('config', {}), dict):
+                        conn.send({'status': 'error', 'error': '任务必须是字典'})
+                        continue
+                    if job.get('command') == 'shutdown':
+                        conn.send({'status': 'stopped'})
+                        break
+                    rejected = sorted(set(job.get('config', {})) - set(DAEMON_JOB_CONFIG_KEYS))
+                    if rejected:
+                        logging.warning(f"拒绝任务，包含不允许覆盖的配置: {rejected}")
+                        conn.send({'status': 'error', 'error': f"不允许覆盖的配置: {rejected}"})
+                        continue
+
+                    self.config = {**base_config, **job.get('config', {})}
+                    self.reset_run_state()
+                    logging.info(f"收到爬取任务，输出到 {self.output_file}")
+                    self.run(keep_browser=True)
+                    conn.send({
+                        'status': 'error' if self.last_error else 'ok',
+                        'error': self.last_error,
+                        'output_file': self.output_file,
+                        'products': self.saved_count,
+                        'browser': dict(self.browser.stats)
+                    })
+        self.config = base_config
+
+    def open_job_queue(self):
+        """打开分布式模式的任务队列，限速改用队列中的共享令牌桶，多个工作进程合计不超过配置的速率"""
+        jobs = JobQueue(self.config['queue_file'], self.config['queue_lease_seconds'],
+                        self.config['queue_max_attempts'])
+        self.rate_limiter = HostRateLimiter(self.config['host_rate_limits'], self.config['default_rate_limit'],
+                                            job_queue=jobs)
+        return jobs
+
+    def run_coordinator(self):
+        """
+        分布式模式的协调进程：执行列表页阶段，把产品写入任务队列，
+        等待工作进程全部处理完后按列表顺序汇总输出
+        """
+        jobs = self.open_job_queue()
+        try:
+            logging.info("Starting coordinator run")
+            if self.config['incremental']:
+                self.load_previous_data()
+
+            if self.config['resume'] and jobs.run_state()[1] == 'queued':
+                logging.info(f"断点续爬：沿用队列 {self.config['queue_file']} 中的任务")
+            else:
+                jobs.start_run(f"{datetime.fromtimestamp(self.metrics.started):%Y%m%dT%H%M%S}-{os.getpid()}")
+                scheduler = self.collect_listings()
+                if self.config['incremental']:
+                    self.plan_incremental(scheduler.cards)
+
+                # 按调度顺序确定优先级，序号保留列表顺序用于汇总
+                ordered = []
+                while True:
+                    item = scheduler.pop()
+                    if item is None:
+                        break
+                    index, card_info = item
+                    ordered.append((index, len(ordered), card_info))
+                jobs.enqueue(ordered)
+                jobs.set_meta('run_state', 'queued')
+                logging.info(f"已写入 {len(ordered)} 个产品任务到 {self.config['queue_file']}")
+
+            # 列表页阶段结束后协调进程不再需要浏览器
+            self.browser.close()
+            self.main_session = None
+
+            while True:
+                counts = jobs.counts()
+                remaining = counts.get('pending', 0) + counts.get('leased', 0)
+                logging.info(f"任务进度: 待处理 {counts.get('pending', 0)}，处理中 {counts.get('leased', 0)}，"
+                             f"完成 {counts.get('done', 0)}，失败 {counts.get('failed', 0)}")
+                if not remaining:
+                    break
+                time.sleep(self.config['queue_poll_interval'])
+
+            self.metrics.inc('products_processed', counts.get('done', 0))
+            self.metrics.inc('products_failed', counts.get('failed', 0))
+            self.tools_data = list(jobs.results())
+            # 标记本轮结束，之后启动的工作进程会等待下一轮而不是直接退出
+            jobs.set_meta('run_state', 'finished')
+            if self.config['incremental']:
+                self.merge_incremental()
+            self.save_data()
+            self.export_data()
+            logging.info("Completed coordinator run")
+
+        except Exception as e:
+            logging.error(f"Error in coordinator run: {str(e)}")
+            self.last_error = str(e)
+
+        finally:
+            jobs.close()
+            self.selectors.save()
+            self.write_run_report()
+            self.close()
+
+    def run_worker(self, worker_id):
+        """
+        分布式模式的工作进程：使用自己的浏览器从任务队列领取产品，处理后写回结果
+
+        只在自己参与的那一轮运行中、协调进程已写完全部任务且队列为空时退出；
+        队列里残留上一轮已结束的状态时等待协调进程开始新一轮。
+        """
+        jobs = self.open_job_queue()
+        joined_run = None
+        try:
+            logging.info(f"工作进程 {worker_id} 已启动，队列 {self.config['queue_file']}")
+            self.start_screenshot_pipeline()
+            while True:
+                job = jobs.claim(worker_id)
+                run_id, state = jobs.run_state()
+                if state in ('listing', 'queued'):
+                    joined_run = run_id
+                if job is None:
+                    counts = jobs.counts()
+                    if (joined_run is not None and run_id == joined_run and state in ('queued', 'finished')
+                            and not counts.get('pending') and not counts.get('leased')):
+                        break
+                    time.sleep(self.config['queue_poll_interval'])
+                    continue
+
+                job_id, card_info = job
+                tool_data = None
+                try:
+                    with self.metrics.timer('product_total'):
+                        tool_data = self.process_product(card_info, card_info['listing_url'])
+                    screenshot = tool_data.get('screenshot') if tool_data else None
+                    if isinstance(screenshot, Future):
+                        tool_data = self.resolve_screenshot(tool_data, screenshot)
+                except Exception as e:
+                    kind = classify_error(e)
+                    logging.error(f"处理产品 {card_info['name']} 时出错（{kind}）: {str(e)}", exc_info=True)
+                    self.metrics.inc(f'errors_{kind}')
+                finally:
+                    self.metrics.inc('products_processed' if tool_data else 'products_failed')
+                    if not jobs.finish(job_id, worker_id, tool_data):
+                        logging.warning(f"任务 {card_info['name']} 的租约已过期并被重新分配，丢弃本次结果")
+                    self.browser.check(self.main_session)
+            logging.info(f"工作进程 {worker_id} 没有剩余任务，退出")
+
+        except Exception as e:
+            logging.error(f"Error in worker run: {str(e)}")
+            self.last_error = str(e)
 
         finally:
-            # 清理资源
-            if hasattr(self, 'driver'):
-                self.driver.quit()
+            # 截图流水线仍可能通过共享令牌桶访问队列，先停止再关闭队列
+            self.stop_screenshot_pipeline()
+            jobs.close()
+            self.selectors.save()
+            self.write_run_report()
+            self.close()
+
+    def write_run_report(self):
+        """写出JSON运行报告，按配置同时写出Prometheus文本文件"""
+        if self.stream:
+            self.metrics.inc('stream_bytes_written', self.stream.bytes_written)
+        stages = self.metrics.summary()['stages']
+        extra = {
+            'products': self.saved_count,
+            # 各错误类型在失败尝试和退避等待上累计花费的时间
+            'retry_seconds': {stage[len('retry_'):]: stats['total_seconds']
+                              for stage, stats in stages.items() if stage.startswith('retry_')},
+            'readiness': self.readiness_stats,
+            'resources': self.resource_stats,
+            'browser': self.browser.stats
+        }
+        try:
+            if self.config['metrics_file']:
+                self.metrics.write_json(self.config['metrics_file'], extra)
+                logging.info(f"运行报告已写入 {self.config['metrics_file']}")
+            if self.config['prometheus_textfile']:
+                self.metrics.write_prometheus(self.config['prometheus_textfile'])
+        except Exception as e:
+            logging.error(f"写入运行报告失败: {str(e)}")
+
+    def close_stream(self):
+        """关闭本次运行的NDJSON流"""
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+    def close(self):
+        """清理资源"""
+        self.stop_screenshot_pipeline()
+        self.browser.close()
+        self.main_session = None
+        if self.cache:
+            self.cache.close()
+        self.close_stream()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='AI工具爬虫')
+    parser.add_argument('--workers', type=int, default=1, help='并发浏览器实例数量')
+    parser.add_argument('--screenshot-workers', type=int, default=0, help='独立截图流水线的浏览器数量')
+    parser.add_argument('--prometheus-textfile', help='Prometheus textfile 指标输出路径')
+    parser.add_argument('--incremental', action='store_true', help='只处理相对上次输出新增或变化的产品')
+    parser.add_argument('--resume', action='store_true', help='从上次中断处继续，跳过NDJSON中已写入的产品')
+    parser.add_argument('--compact', action='store_true', help='只把NDJSON压实为JSON数组，不启动爬虫')
+    parser.add_argument('--bounded-memory', action='store_true', help='边滚动边处理，内存占用不随产品数量增长')
+    parser.add_argument('--daemon', metavar='[HOST:]PORT', help='以常驻模式运行，保持浏览器预热并接收爬取任务，默认只监听本机')
+    parser.add_argument('--submit', metavar='[HOST:]PORT', help='向常驻进程提交一次爬取任务并等待结果')
+    parser.add_argument('--shutdown', metavar='[HOST:]PORT', help='通知常驻进程退出')
+    parser.add_argument('--authkey', default=os.environ.get('AI_CRAWLER_AUTHKEY'),
+                        help='常驻模式连接密钥（必填），默认读取环境变量 AI_CRAWLER_AUTHKEY')
+    parser.add_argument('--coordinator', action='store_true', help='分布式模式：执行列表页阶段并把产品写入任务队列')
+    parser.add_argument('--worker', action='store_true', help='分布式模式：从任务队列领取产品处理')
+    parser.add_argument('--worker-id', default=f'{socket.gethostname()}-{os.getpid()}', help='工作进程标识')
+    parser.add_argument('--queue-file', default='crawl_queue.sqlite', help='分布式模式共享的任务队列文件')
+    parser.add_argument('--export', default='', help='额外导出格式，逗号分隔：parquet,ndjson.gz,sqlite')
+    args = parser.parse_args()
+    if (args.daemon or args.submit or args.shutdown) and not args.authkey:
+        parser.error('常驻模式需要通过 --authkey 或环境变量 AI_CRAWLER_AUTHKEY 指定连接密钥')
+
+    if args.submit or args.shutdown:
+        if args.shutdown:
+            job = {'command': 'shutdown'}
+        else:
+            job = {'config': {'workers': args.workers, 'screenshot_workers': args.screenshot_workers,
+                              'incremental': args.incremental, 'resume': args.resume,
+                              'bounded_memory': args.bounded_memory,
+                              'export_formats': [fmt.strip() for fmt in args.export.split(',') if fmt.strip()]}}
+        print(json.dumps(submit_job(parse_address(args.submit or args.shutdown), args.authkey.encode(), job),
+                         ensure_ascii=False))
+        raise SystemExit(0)
+
+    config = {
+        'workers': args.workers,
+        'screenshot_workers': args.screenshot_workers,
+        'incremental': args.incremental,
+        'resume': args.resume,
+        'bounded_memory': args.bounded_memory,
+        'queue_file': args.queue_file,
+        'export_formats': [fmt.strip() for fmt in args.export.split(',') if fmt.strip()],
+        'prometheus_textfile': args.prometheus_textfile
+    }
+    if args.worker:
+        # 结果写回队列，由协调进程汇总；各工作进程的运行报告分开保存
+        config.update({'stream_file': None, 'metrics_file': f'crawl_report.{args.worker_id}.json'})
+
     try:
-        crawler = AIToolsCrawler()
-        crawler.run()
+        crawler = AIToolsCrawler(config=config, start_browser=not args.compact)
+        if args.coordinator:
+            crawler.run_coordinator()
+        elif args.worker:
+            crawler.run_worker(args.worker_id)
+        elif args.compact:
+            try:
+                crawler.compact_stream()
+            finally:
+                crawler.close()
+        elif args.daemon:
+            try:
+                crawler.serve(parse_address(args.daemon), args.authkey.encode())
+            finally:
+                crawler.close()
+        else:
+            crawler.run()
     except Exception as e:
         logging.error(f"Critical error in main: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,331 @@
+import argparse
+import copy
+import importlib.util
+import json
+import logging
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bs4 import BeautifulSoup
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_crawler_module():
+    """加载 ai-tools-crawler.py（文件名含连字符，不能直接 import）"""
+    spec = importlib.util.spec_from_file_location('ai_tools_crawler', os.path.join(ROOT, 'ai-tools-crawler.py'))
+    module = importlib.util.module_from_spec(spec)
+    # 注册到 sys.modules，压缩进程池才能序列化模块内的函数
+    sys.modules['ai_tools_crawler'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_listing(fixture_html, card_count=None):
+    """
+    基于录制的列表页生成离线版本：去掉脚本、缩略图改为本地地址，
+    指定 card_count 时复制第一个卡片生成N个合成产品
+    """
+    soup = BeautifulSoup(fixture_html, 'html.parser')
+    for script in soup.find_all('script'):
+        script.decompose()
+
+    cards = soup.find_all('div', {'data-sentry-component': 'ProductItem'})
+    if card_count is not None and cards:
+        template = cards[0]
+        container = template.parent
+        for card in cards:
+            card.extract()
+        for i in range(card_count):
+            card = copy.copy(template)
+            slug = f'bench-product-{i}'
+            for link in card.find_all('a', href=True):
+                link['href'] = re.sub(r'^/products/[^/]+', f'/products/{slug}', link['href'])
+            name_elem = card.find('div', {'data-test': 'product-item-name'})
+            name_elem.clear()
+            name_elem.append(f'Bench Product {i} — Synthetic benchmark product number {i}.')
+            followers = card.find('div', {'class': 'styles_followersCount__Auv5S'})
+            if followers:
+                followers.string = f'{(i * 37) % 5000} Followers'
+            container.append(card)
+
+    for img in soup.find_all('img'):
+        img['src'] = '/static/thumbnail.png'
+        if img.has_attr('srcset'):
+            del img['srcset']
+    return str(soup)
+
+
+class FakeProductHunt:
+    """本地假 ProductHunt 服务：列表页、产品详情页以及产品网站"""
+
+    def __init__(self, listing_html, fixtures_dir=None):
+        self.listing_html = listing_html.encode('utf-8')
+        self.fixtures_dir = fixtures_dir
+        with open(os.path.join(ROOT, 'screenshots', 'RAFA_20250109_141953.png'), 'rb') as f:
+            self.image = f.read()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class())
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path == '/':
+                    self.reply('<html><body><h1>Product Hunt</h1></body></html>')
+                elif path.startswith('/topics/'):
+                    self.reply(site.listing_html)
+                elif path.startswith('/products/'):
+                    self.reply(site.product_page(path.split('/')[2]))
+                elif path.startswith('/site/'):
+                    slug = path.split('/')[2]
+                    self.reply(f'<html><head><title>{slug}</title></head><body><h1>{slug}</h1>'
+                               f'<img src="/static/hero.png" width="960"><p>{"Lorem ipsum " * 200}</p>'
+                               f'</body></html>')
+                elif path.startswith('/static/'):
+                    self.reply(site.image, 'image/png')
+                else:
+                    self.send_error(404)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.end_headers()
+
+            def reply(self, body, content_type='text/html; charset=utf-8'):
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def product_page(self, slug):
+        """优先使用录制的详情页，否则生成带 Visit website 链接的最小页面"""
+        if self.fixtures_dir:
+            path = os.path.join(self.fixtures_dir, f'{slug}.html')
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return f.read()
+        return (f'<html><body><h1>{slug}</h1>'
+                f'<a href="{self.base_url}/site/{slug}" class="styles_websiteButton__x">Visit website</a>'
+                f'</body></html>')
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ProcessSampler:
+    """后台采样当前进程及其子孙进程（含Chrome）的总RSS和Chrome进程数"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_chrome = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    @staticmethod
+    def descendants():
+        """读取 /proc 构建进程树，返回当前进程及其所有子孙进程的 (pid, 名称)"""
+        children = {}
+        names = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'r') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            name = stat[stat.index('(') + 1:stat.rindex(')')]
+            ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+            names[int(entry)] = name
+            children.setdefault(ppid, []).append(int(entry))
+
+        result = []
+        stack = [os.getpid()]
+        while stack:
+            pid = stack.pop()
+            result.append((pid, names.get(pid, '')))
+            stack.extend(children.get(pid, []))
+        return result
+
+    @staticmethod
+    def rss_bytes(pid):
+        try:
+            with open(f'/proc/{pid}/statm', 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            return 0
+
+    def run(self):
+        while not self.stopped.is_set():
+            processes = self.descendants()
+            self.peak_rss = max(self.peak_rss, sum(self.rss_bytes(pid) for pid, _ in processes))
+            self.peak_chrome = max(self.peak_chrome, sum(1 for _, name in processes if 'chrom' in name.lower()))
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        if os.path.isdir('/proc'):
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        if not self.peak_rss:
+            # 非Linux平台只能拿到本进程的峰值
+            self.peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_parse(crawler_module, listing_html, repeat):
+    """离线解析基准：各解析器解析同一列表页的平均耗时"""
+    crawler = crawler_module.AIToolsCrawler(output_file=os.devnull, config={'cache_file': None}, start_browser=False)
+    results = {}
+    for backend in ('html.parser', 'lxml', 'selectolax'):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            cards = crawler.parse_listing_html(listing_html, backend)
+        results[backend] = {'cards': len(cards), 'mean_ms': round((time.perf_counter() - start) / repeat * 1000, 2)}
+    return results
+
+
+def bench_crawl(crawler_module, server, workdir, config):
+    """完整爬取基准：对本地服务运行 run()，统计吞吐量、延迟分位数、内存和Chrome进程数"""
+    crawler_config = {
+        'base_url': server.base_url,
+        'cache_file': None,
+        'host_rate_limits': {},
+        'screenshots_dir': os.path.join(workdir, 'screenshots'),
+        'stream_file': os.path.join(workdir, 'ai_tools.ndjson'),
+        'checkpoint_file': os.path.join(workdir, 'crawl_checkpoint.json'),
+        'metrics_file': os.path.join(workdir, 'crawl_report.json'),
+        'scroll_count': 3
+    }
+    crawler_config.update(config)
+
+    sampler = ProcessSampler()
+    sampler.start()
+    start = time.perf_counter()
+    crawler = crawler_module.AIToolsCrawler(output_file=os.path.join(workdir, 'ai_tools.json'), config=crawler_config)
+    crawler.run()
+    duration = time.perf_counter() - start
+    sampler.stop()
+
+    with open(crawler_config['metrics_file'], 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    product_stage = report['stages'].get('product_total', {})
+    products = report['products']
+    return {
+        'products': products,
+        'duration_seconds': round(duration, 2),
+        'products_per_minute': round(products / duration * 60, 2) if duration else 0,
+        'p50_product_seconds': product_stage.get('p50_seconds'),
+        'p95_product_seconds': product_stage.get('p95_seconds'),
+        'peak_rss_mb': round(sampler.peak_rss / 1024 / 1024, 1),
+        'peak_chrome_processes': sampler.peak_chrome,
+        'stages': report['stages']
+    }
+
+
+def run_benchmarks(args, crawler_module, listing_html, workdir):
+    result = {
+        'commit': git_commit(),
+        'run_at': datetime.now().isoformat(),
+        'params': {
+            'cards': args.cards,
+            'workers': args.workers,
+            'screenshot_workers': args.screenshot_workers,
+            'extraction_mode': args.extraction_mode
+        },
+        'parse': bench_parse(crawler_module, listing_html, args.parse_repeat)
+    }
+
+    if not args.parse_only:
+        server = FakeProductHunt(listing_html, args.product_fixtures)
+        server.start()
+        try:
+            result['crawl'] = bench_crawl(crawler_module, server, workdir, {
+                'workers': args.workers,
+                'screenshot_workers': args.screenshot_workers,
+                'extraction_mode': args.extraction_mode
+            })
+        finally:
+            server.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线爬虫基准测试（本地假 ProductHunt 服务，无需联网）')
+    parser.add_argument('--cards', type=int, default=None, help='合成卡片数量，默认使用录制的列表页')
+    parser.add_argument('--fixture', default=os.path.join(ROOT, 'page_source.html'), help='录制的列表页HTML')
+    parser.add_argument('--product-fixtures', help='录制的详情页目录，文件名为 <slug>.html')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--screenshot-workers', type=int, default=0)
+    parser.add_argument('--extraction-mode', choices=['soup', 'dom'], default='soup')
+    parser.add_argument('--parse-repeat', type=int, default=20, help='离线解析基准重复次数')
+    parser.add_argument('--parse-only', action='store_true', help='只运行离线解析基准，不启动浏览器')
+    # 默认写到系统临时目录下的固定文件：跨提交对比时结果累积在一起，又不会在仓库里留下未跟踪文件
+    parser.add_argument('--output', default=os.path.join(tempfile.gettempdir(), 'ai-tools-crawler-benchmark.jsonl'),
+                        help='结果追加写入的JSONL文件，便于跨提交对比')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    crawler_module = load_crawler_module()
+    with open(args.fixture, 'r', encoding='utf-8') as f:
+        listing_html = build_listing(f.read(), args.cards)
+
+    # 爬虫会在当前目录写日志和调试截图，切到临时目录避免污染仓库
+    workdir = tempfile.mkdtemp(prefix='crawler-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        result = run_benchmarks(args, crawler_module, listing_html, workdir)
+    finally:
+        os.chdir(cwd)
+
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    for backend, stats in result['parse'].items():
+        print(f"parse[{backend}]: {stats['cards']} cards, {stats['mean_ms']} ms")
+    crawl = result.get('crawl')
+    if crawl:
+        print(f"products: {crawl['products']} in {crawl['duration_seconds']}s "
+              f"({crawl['products_per_minute']} /min)")
+        print(f"per-product p50/p95: {crawl['p50_product_seconds']}s / {crawl['p95_product_seconds']}s")
+        print(f"peak RSS: {crawl['peak_rss_mb']} MB, peak Chrome processes: {crawl['peak_chrome_processes']}")
+    print(f"results appended to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+import importlib.util
+import os
+import sys
+
+# 爬虫脚本文件名带连字符，按路径加载后注册为 crawler 模块供测试导入
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+spec = importlib.util.spec_from_file_location('crawler', os.path.join(ROOT, 'ai-tools-crawler.py'))
+crawler = importlib.util.module_from_spec(spec)
+sys.modules['crawler'] = crawler
+spec.loader.exec_module(crawler)
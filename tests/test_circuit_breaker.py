@@ -0,0 +1,50 @@
+import threading
+import time
+
+import crawler
+
+URL = 'https://example.com/app'
+
+
+def allow_from_other_thread(breaker):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(breaker.allow(URL)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def open_breaker():
+    breaker = crawler.CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure(URL)
+    assert breaker.record_failure(URL)
+    assert not breaker.allow(URL)
+    time.sleep(0.06)
+    return breaker
+
+
+def test_single_probe_after_cooldown():
+    breaker = open_breaker()
+    assert breaker.allow(URL)
+    # 试探结果出来前其他线程仍被拒绝
+    assert not allow_from_other_thread(breaker)
+    breaker.record_success(URL)
+    assert allow_from_other_thread(breaker)
+    assert not breaker.is_open(URL)
+
+
+def test_failed_probe_reopens():
+    breaker = open_breaker()
+    assert breaker.allow(URL)
+    assert breaker.record_failure(URL)
+    assert not allow_from_other_thread(breaker)
+    time.sleep(0.06)
+    assert allow_from_other_thread(breaker)
+
+
+def test_released_probe_goes_to_next_caller():
+    breaker = open_breaker()
+    assert breaker.allow(URL)
+    breaker.release(URL)
+    assert allow_from_other_thread(breaker)
+    assert breaker.is_open(URL)
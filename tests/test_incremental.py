@@ -0,0 +1,45 @@
+import json
+
+import crawler
+
+
+def record(name, followers):
+    return {'name': name, 'product_url': f'https://www.producthunt.com/posts/{name}', 'description': name,
+            'thumbnail': '', 'followers': followers, 'tags': []}
+
+
+def make_crawler(tmp_path, previous):
+    output = tmp_path / 'ai_tools.json'
+    output.write_text(json.dumps(previous), encoding='utf-8')
+    instance = crawler.AIToolsCrawler(output_file=str(output), start_browser=False, config={
+        'cache_file': None, 'selector_stats_file': None, 'metrics_file': None, 'stream_file': None,
+        'delta_file': str(tmp_path / 'delta.json'), 'incremental': True})
+    instance.load_previous_data()
+    return instance
+
+
+def test_failed_product_keeps_previous_record(tmp_path):
+    instance = make_crawler(tmp_path, [record('a', 1), record('b', 2)])
+    instance.plan_incremental([record('a', 1), record('b', 5)])
+    # b 的关注数变化需要重新处理，但这次处理失败没有结果
+    instance.tools_data = [record('a', 1)]
+    instance.merge_incremental()
+
+    assert [r['name'] for r in instance.tools_data] == ['a', 'b']
+    assert instance.tools_data[1]['followers'] == 2
+    delta = json.loads((tmp_path / 'delta.json').read_text(encoding='utf-8'))
+    assert [r['name'] for r in delta['stale']] == ['b']
+    assert delta['stale'][0]['status'] == 'changed'
+    assert delta['removed'] == [] and delta['changed'] == []
+
+
+def test_missing_product_is_removed(tmp_path):
+    instance = make_crawler(tmp_path, [record('a', 1), record('b', 2)])
+    instance.plan_incremental([record('a', 1), record('c', 3)])
+    instance.tools_data = [record('a', 1), record('c', 3)]
+    instance.merge_incremental()
+
+    delta = json.loads((tmp_path / 'delta.json').read_text(encoding='utf-8'))
+    assert [r['name'] for r in delta['added']] == ['c']
+    assert [r['name'] for r in delta['removed']] == ['b']
+    assert delta['stale'] == []
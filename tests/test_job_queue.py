@@ -0,0 +1,85 @@
+import time
+
+import crawler
+
+
+def card(name):
+    return {'name': name, 'product_url': f'https://www.producthunt.com/posts/{name}', 'listing_url': ''}
+
+
+def test_lease_expiry_late_finish_and_exit(tmp_path):
+    jobs = crawler.JobQueue(str(tmp_path / 'queue.sqlite'), lease_seconds=0.05, max_attempts=3)
+    jobs.start_run('run-1')
+    jobs.enqueue([(0, 0, card('a'))])
+    jobs.set_meta('run_state', 'queued')
+
+    # 第一个工作进程领取后租约过期，任务被第二个工作进程重新领取
+    job_id, _ = jobs.claim('w1')
+    time.sleep(0.1)
+    assert jobs.claim('w2')[0] == job_id
+    assert jobs.counts() == {'leased': 1}
+
+    # 过期的工作进程晚到的结果被丢弃，新的租约持有者提交成功
+    assert not jobs.finish(job_id, 'w1', {'name': 'stale'})
+    assert jobs.finish(job_id, 'w2', {'name': 'a'})
+    assert list(jobs.results()) == [{'name': 'a'}]
+    assert jobs.counts() == {'done': 1}
+    assert jobs.claim('w1') is None
+    assert jobs.run_state() == ('run-1', 'queued')
+    jobs.close()
+
+
+def test_worker_waits_on_stale_queue_until_new_run(tmp_path, monkeypatch):
+    path = str(tmp_path / 'queue.sqlite')
+    jobs = crawler.JobQueue(path)
+    jobs.start_run('run-1')
+    jobs.set_meta('run_state', 'finished')
+
+    # 只保留 run_worker 用到的状态，不启动浏览器
+    worker = crawler.AIToolsCrawler.__new__(crawler.AIToolsCrawler)
+    worker.config = {'queue_file': path, 'queue_lease_seconds': 60, 'queue_max_attempts': 3,
+                     'queue_poll_interval': 0, 'host_rate_limits': {}, 'default_rate_limit': None}
+    worker.metrics = crawler.CrawlMetrics()
+    worker.last_error = None
+    worker.main_session = None
+    worker.browser = type('Browser', (), {'check': lambda self, session: None})()
+    worker.selectors = type('Selectors', (), {'save': lambda self: None})()
+    worker.start_screenshot_pipeline = worker.stop_screenshot_pipeline = lambda: None
+    worker.write_run_report = worker.close = lambda: None
+    processed = []
+    worker.process_product = lambda card_info, listing_url: processed.append(card_info['name']) or card_info
+
+    polls = []
+
+    def sleep(seconds):
+        # 上一轮已结束时工作进程不能退出；等待期间协调进程开始新一轮并写完任务
+        polls.append(seconds)
+        if len(polls) == 2:
+            jobs.start_run('run-2')
+            jobs.enqueue([(0, 0, card('b'))])
+            jobs.set_meta('run_state', 'queued')
+
+    monkeypatch.setattr(crawler.time, 'sleep', sleep)
+    worker.run_worker('w1')
+
+    assert worker.last_error is None
+    assert len(polls) == 2
+    assert processed == ['b']
+    assert jobs.counts() == {'done': 1}
+    jobs.close()
+
+
+def test_rate_limit_is_shared_between_queue_connections(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    first, second = crawler.JobQueue(path), crawler.JobQueue(path)
+    limits = {'producthunt.com': {'rate': 10, 'burst': 1}}
+    # 两个工作进程各自打开队列，但预约的是同一个令牌桶
+    limiters = [crawler.HostRateLimiter(limits, job_queue=jobs) for jobs in (first, second)]
+    started = time.time()
+    for _ in range(3):
+        for limiter in limiters:
+            limiter.wait('https://www.producthunt.com/posts/a')
+    assert time.time() - started >= 0.5
+    assert limiters[0].wait('https://example.com/') == 0
+    first.close()
+    second.close()